@@ -1,19 +1,45 @@
 from bs4 import BeautifulSoup
+from bs4.builder import LXMLTreeBuilderForXML
+from lxml import etree
 from dateutil import parser as dtparser
-import unicodedata
 import re
+from functools import cached_property
+from normalization import gap_clean, remove_diacritics
+
+
+class StrictXMLTreeBuilder(LXMLTreeBuilderForXML):
+    """Tree builder for BeautifulSoup raising an lxml.etree.XMLSyntaxError on XML which is not well-formed, instead of
+    recovering from it
+    """
+
+    def default_parser(self, encoding):
+        return etree.XMLParser(
+            target=self, strip_cdata=False, recover=False, encoding=encoding
+        )
 
 
 class TEIFile(object):
-    def __init__(self, filepath, clear_only, verbose):
+    def __init__(self, filepath, clear_only, verbose, header_only=False):
         self._filepath = filepath
-        self._soup = self._read_tei(self._filepath)
+        # error message if the document is not well-formed, checked while reading it
+        self.parse_error = None
+        # in header only mode the document is only read until </teiHeader>, no verses are available
+        try:
+            self._soup = (
+                self._read_tei_header(self._filepath)
+                if header_only
+                else self._read_tei(self._filepath)
+            )
+        except etree.XMLSyntaxError as e:
+            self.parse_error = str(e)
+            self._soup = None
         self._clear_only = clear_only
         self.verbose = verbose
+        self._header_only = header_only
 
-    # All properties below are currently read only
+    # All properties below are currently read only, header properties are extracted once and memoized
 
-    @property
+    @cached_property
     def ga(self) -> str or None:
         """Property returning the Gregory Aaland (GA) Number
 
@@ -25,7 +51,7 @@ class TEIFile(object):
             print(f"No title; {e} for file {self._filepath}") if self.verbose else None
             return None
 
-    @property
+    @cached_property
     def publisher(self) -> list or None:
         """Property returning the names of publishing institutions/persons
 
@@ -44,7 +70,7 @@ class TEIFile(object):
             )
             return None
 
-    @property
+    @cached_property
     def founder(self) -> str or None:
         """Property returning the name of founding institution
 
@@ -60,7 +86,7 @@ class TEIFile(object):
             )
             return None
 
-    @property
+    @cached_property
     def label(self) -> str or None:
         """Property returning the name of the document
 
@@ -72,7 +98,7 @@ class TEIFile(object):
             print(f"No label; {e} for file {self._filepath}") if self.verbose else None
             return None
 
-    @property
+    @cached_property
     def sponsor(self) -> set or None:
         """Property returning the names of sponsoring institutions/persons
 
@@ -91,7 +117,7 @@ class TEIFile(object):
             )
             return None
 
-    @property
+    @cached_property
     def edition(self) -> ():
         """Property returning the editions version and date (in YYYY-MM-DD format) as tuple
 
@@ -120,7 +146,7 @@ class TEIFile(object):
 
         return edition, date
 
-    @property
+    @cached_property
     def publishing_date(self) -> str or None:
         """Property returning the publishing date of the document in YYYY-MM-DD Format
 
@@ -137,7 +163,7 @@ class TEIFile(object):
             )
             return None
 
-    @property
+    @cached_property
     def alt_identifiers(self) -> dict or None:
         """Property returning alternative identifiers for a documents
 
@@ -177,7 +203,7 @@ class TEIFile(object):
     #        )
     #        return None
 
-    @property
+    @cached_property
     def encoding_version(self) -> str or None:
         """Property returning the encoding version (by the IGNTP) of the document
 
@@ -352,19 +378,21 @@ class TEIFile(object):
     def transcriptions(self) -> list[dict]:
         # TODO: split into sub functions as currently too much is going on here, also for debugging
         # TODO: test when function is split into sub functions
-        """Property returning the transcriptions of verses of the document
+        """Property returning the transcriptions of verses of the document, grouped by verse id in order of the first
+        occurrence of the verse id (TEIStreamFile keeps the document order instead)
 
         :return: dictionary of the documents structure
         """
         transcriptions_list = []
 
+        # walk the document once to get all ab tags grouped by verse_id
+        verse_index = self._get_verse_index()
+
         # iterate through all known verse_ids in document
-        for idx, verse_id in enumerate(self.verses, start=1):
+        for idx, (verse_id, verse_parts) in enumerate(verse_index.items(), start=1):
             # verbose output
             if self.verbose:
-                print(f"Verse {idx} of {len(self.verses)}")
-            # get all ab tags of verse by soup.find_all (generates an ordered list, beginning at the start of the document)
-            verse_parts = self._soup.find_all("ab", attrs={"n": verse_id})
+                print(f"Verse {idx} of {len(verse_index)}")
 
             while verse_parts:
                 # get first entry
@@ -374,42 +402,13 @@ class TEIFile(object):
 
                 # if part is a 'I' Part
                 if first_part.get("part") == "I" and len(verse_parts) > 0:
-                    # also get the followup part ('F')
-                    second_part = verse_parts.pop(0)
-                    # merge followup into first part
-                    first_part.extend(second_part.contents)
-                    # merge parted words by finding all <w> tags with attribute part='F'
-                    part_f_tag = first_part.find("w", attrs={"part": "F"})
-                    # check if one is found
-                    if part_f_tag:
-                        # merge them with previous sibling
-                        preceding_w_tag = part_f_tag.find_previous_sibling("w")
-                        if preceding_w_tag:
-                            # get text of both word tags
-                            combined_text = (
-                                preceding_w_tag.get_text() + part_f_tag.get_text()
-                            )
-                            # create new word tag
-                            new_tag = self._soup.new_tag("ns0:w", part="combined")
-                            new_tag.string = combined_text
-                            # Replace the original tags with the new tag
-                            preceding_w_tag.insert_after(new_tag)
-                            preceding_w_tag.decompose()
-                            part_f_tag.decompose()
-                    verse_transcript = self._get_verse_transcription(first_part)
-
-                # else get the transcription of one
-                else:
-                    verse_transcript = self._get_verse_transcription(first_part)
+                    # also get the followup part ('F') and merge it into the first part
+                    self._merge_verse_parts(first_part, verse_parts.pop(0), self._soup)
 
                 transcriptions_list.append(
-                    {
-                        "lection": lection_div["n"] if lection_div else None,
-                        "verse": verse_id,
-                        "transcript": self._str_remove_diacritics(
-                            verse_transcript
-                        ).lower(),
-                    }
+                    self._verse_entry(
+                        first_part, verse_id, lection_div["n"] if lection_div else None
+                    )
                 )
 
         return transcriptions_list
@@ -427,36 +426,71 @@ class TEIFile(object):
         else:
             return None
 
+    @property
+    def well_formed(self) -> bool or None:
+        """Property returning if the document (read so far) is well-formed XML
+
+        :return: True if no syntax error occurred reading the document, None (unknown) if only its teiHeader was read
+            without error
+        """
+        if self.parse_error is not None:
+            return False
+        return None if self._header_only else True
+
     @staticmethod
     def _read_tei(tei_file_path: str) -> BeautifulSoup:
-        """Read a TEI file with beautiful soup
+        """Read a TEI file with beautiful soup, checking it is well-formed XML in the same pass
 
         :param tei_file_path: file path to TEI file
         :return: BeautifulSoup object of TEI file
+        :raises etree.XMLSyntaxError: if the file is not well-formed
         """
         try:
             with open(tei_file_path, "r") as tei:
-                soup = BeautifulSoup(tei, "xml")
+                soup = BeautifulSoup(tei, builder=StrictXMLTreeBuilder())
                 return soup
+        except etree.XMLSyntaxError:
+            raise
         except Exception as exception:
             print("An error occurred:", exception)
 
     @staticmethod
-    def _str_remove_diacritics(s: str) -> str:
-        """Normalize string by removing accents and converting to lower case.
+    def _read_tei_header(tei_file_path: str) -> BeautifulSoup or None:
+        """Read only the teiHeader of a TEI file with beautiful soup, the body is not parsed
 
-        - unicodedata.normalize('NFKD', s): normalizes the input Unicode string s using NFKD normalization. Valid normalization forms are ‘NFC’, ‘NFKC’, ‘NFD’, and ‘NFKD’.
-        - (c for c in ...): This is a generator expression that iterates over each character c in the normalized string obtained in the previous step.
-        - if unicodedata.category(c) != 'Mn': This condition checks whether the Unicode character c belongs to the category 'Mn' (Mark, Non-Spacing). Characters in this category are combining characters that modify the meaning of the preceding base character. The condition filters out all combining characters from the normalized string.
+        :param tei_file_path: file path to TEI file
+        :return: BeautifulSoup object of the teiHeader
+        :raises etree.XMLSyntaxError: if the file is not well-formed up to the end of the teiHeader
+        """
+        try:
+            for _, elem in etree.iterparse(str(tei_file_path), events=("end",)):
+                if TEIFile._local_name(elem) == "teiHeader":
+                    return BeautifulSoup(
+                        etree.tostring(elem, encoding="unicode", with_tail=False),
+                        "xml",
+                    )
+        except etree.XMLSyntaxError:
+            raise
+        except Exception as exception:
+            print("An error occurred:", exception)
+
+    @staticmethod
+    def _local_name(elem: etree.Element) -> str:
+        """Get the tag name of an element without its namespace
+
+        :param elem: lxml element
+        :return: local tag name
+        """
+        return elem.tag.rpartition("}")[2]
+
+    @staticmethod
+    def _str_remove_diacritics(s: str) -> str:
+        """Normalize string by removing accents (see normalization.remove_diacritics)
 
         :param s: String to be normalized.
         :return:  normalized string
         """
-        return "".join(
-            c
-            for c in unicodedata.normalize("NFKD", s)
-            if unicodedata.category(c) != "Mn"
-        )
+        return remove_diacritics(s)
 
     @staticmethod
     def _str_remove_punctuation(s: str) -> str:
@@ -584,26 +618,94 @@ class TEIFile(object):
         )  # Replace multiple spaces with a single space
         return verse_transcript_clean
 
+    def _get_verse_index(self) -> dict:
+        """Walk the document once and group all ab tags with a verse_id by that verse_id
+
+        :return: dictionary of verse_id and list of its ab tags in document order, ordered by first occurrence
+        """
+        verse_index = {}
+        for verse_part in self._soup.find_all("ab", attrs={"n": True}):
+            verse_index.setdefault(verse_part.get("n"), []).append(verse_part)
+        return verse_index
+
+    @staticmethod
+    def _merge_verse_parts(
+        first_part: BeautifulSoup, second_part: BeautifulSoup, soup: BeautifulSoup
+    ) -> BeautifulSoup:
+        """Merge the followup part ('F') of a verse into its initial part ('I'), joining a word split across both
+
+        :param first_part: bs4 object of the ab-tag holding the initial part
+        :param second_part: bs4 object of the ab-tag holding the followup part
+        :param soup: BeautifulSoup object used to create the combined word tag
+        :return: first_part with the contents of second_part merged into it
+        """
+        # merge followup into first part
+        first_part.extend(second_part.contents)
+        # merge parted words by finding all <w> tags with attribute part='F'
+        part_f_tag = first_part.find("w", attrs={"part": "F"})
+        # check if one is found
+        if part_f_tag:
+            # merge them with previous sibling
+            preceding_w_tag = part_f_tag.find_previous_sibling("w")
+            if preceding_w_tag:
+                # get text of both word tags
+                combined_text = preceding_w_tag.get_text() + part_f_tag.get_text()
+                # create new word tag
+                new_tag = soup.new_tag("ns0:w", part="combined")
+                new_tag.string = combined_text
+                # Replace the original tags with the new tag
+                preceding_w_tag.insert_after(new_tag)
+                preceding_w_tag.decompose()
+                part_f_tag.decompose()
+        return first_part
+
+    def _verse_entry(
+        self, verse_object: BeautifulSoup, verse_id: str, lection: str or None
+    ) -> dict:
+        """Build the transcription entry of a (merged) verse block
+
+        :param verse_object: BeautifulSoup object of ab-tag representing a verse
+        :param verse_id: verse identifier as given in the n attribute of the ab-tag
+        :param lection: identifier of the surrounding lection or None
+        :return: dictionary of lection, verse, transcript and text (transcript without GAP markers, see gap_clean)
+        """
+        verse_transcript = self._str_remove_diacritics(
+            self._get_verse_transcription(verse_object)
+        ).lower()
+        return {
+            "lection": lection,
+            "verse": verse_id,
+            "transcript": verse_transcript,
+            "text": gap_clean(verse_transcript),
+        }
+
+    @cached_property
+    def header_data(self) -> dict:
+        """Property returning the header metadata attached to every transcription of the document
+
+        :return: dictionary of the header metadata
+        """
+        return {
+            "publisher": self.publisher[0],
+            "source": self.source,
+            "ga": self.ga,
+            "sponsor": " ;".join(list(self.sponsor)),
+            "founder": self.founder,
+            "edition_version": self.edition[0],
+            "edition_date": self.edition[1],
+            "publishing_date": self.publishing_date,
+            "encoding_version": self.encoding_version,
+        }
+
     def get_transcription_list(self):
         """Get a list of transcriptions from the document
 
         :return: Updated list of transcriptions
         """
         transcripts = self.transcriptions
+        header_data = self.header_data
         for transcript in transcripts:
-            transcript.update(
-                {
-                    "publisher": self.publisher[0],
-                    "source": self.source,
-                    "ga": self.ga,
-                    "sponsor": " ;".join(list(self.sponsor)),
-                    "founder": self.founder,
-                    "edition_version": self.edition[0],
-                    "edition_date": self.edition[1],
-                    "publishing_date": self.publishing_date,
-                    "encoding_version": self.encoding_version,
-                }
-            )
+            transcript.update(header_data)
         return transcripts
 
     def get_manuscript_data(self):
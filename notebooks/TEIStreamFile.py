@@ -0,0 +1,122 @@
+from bs4 import BeautifulSoup
+from lxml import etree
+from TEIFile import TEIFile
+
+
+class TEIStreamFile(TEIFile):
+    """Streaming variant of TEIFile
+
+    Instead of loading the whole document into one BeautifulSoup tree, the document is walked once with an incremental
+    XML parser. Only the teiHeader and the ab-tag currently processed are turned into (small) BeautifulSoup objects,
+    so the transcriptions are built by the very same methods as in TEIFile, while memory stays flat regardless of the
+    size of the document.
+
+    The transcriptions are the same dictionaries as the ones of TEIFile, but in another order: TEIFile groups the
+    verses by verse id (in order of their first occurrence), this class yields them in document order, a verse split
+    into parts at its final part and initial parts without final part at the end. Grouping would mean holding back
+    all verses, so the order is left to the consumer (like the sorting of utils.prepare_verses).
+    """
+
+    def __init__(self, filepath, clear_only, verbose):
+        super().__init__(filepath, clear_only, verbose, header_only=True)
+        # only the teiHeader is read here, the body is streamed by the transcriptions (see well_formed)
+        self._header_only = False
+
+    @property
+    def verses(self) -> set or None:
+        """Property returning the set of verses in the document
+
+        :return: set of verses in the document
+        """
+        verses = set()
+        try:
+            for _, elem in etree.iterparse(str(self._filepath), events=("end",)):
+                if self._local_name(elem) == "ab" and elem.get("n") is not None:
+                    verses.add(elem.get("n"))
+                self._release(elem)
+            return verses
+        except Exception as e:
+            print(f"No verses; {e} for file {self._filepath}") if self.verbose else None
+            return None
+
+    @property
+    def transcriptions(self) -> list[dict]:
+        """Property returning the transcriptions of verses of the document
+
+        :return: dictionary of the documents structure
+        """
+        return list(self.iter_transcriptions())
+
+    def iter_transcriptions(self):
+        """Generator yielding the transcriptions of verses in document order while streaming through the document
+
+        Verses split into an initial ('I') part are held back until their followup part is found, exactly like
+        TEIFile.transcriptions merges them, and yielded then. Initial parts without followup part are yielded at the
+        end (see the class docstring for the order of TEIFile).
+
+        :return: generator of dictionaries of lection, verse and transcript
+        """
+        # initial parts waiting for their followup part: verse_id -> (ab-tag, soup, lection)
+        pending = {}
+        # stack of the n attributes of the lection divs currently open
+        lections = []
+        # depth of nested ab-tags, elements are only released outside of ab-tags
+        ab_depth = 0
+        idx = 0
+
+        for event, elem in etree.iterparse(
+            str(self._filepath), events=("start", "end")
+        ):
+            name = self._local_name(elem)
+            is_lection = name == "div" and elem.get("type") == "lection"
+
+            if event == "start":
+                if is_lection:
+                    lections.append(elem.get("n"))
+                elif name == "ab":
+                    ab_depth += 1
+                continue
+
+            if is_lection:
+                lections.pop()
+            elif name == "ab":
+                ab_depth -= 1
+                verse_id = elem.get("n")
+                if verse_id is not None:
+                    idx += 1
+                    print(f"Verse {idx}") if self.verbose else None
+                    # turn the (small) ab-tag into its own soup to reuse the TEIFile methods
+                    soup = BeautifulSoup(
+                        etree.tostring(elem, encoding="unicode", with_tail=False),
+                        "xml",
+                    )
+                    verse_part = soup.find("ab")
+                    lection = lections[-1] if lections else None
+
+                    if verse_id in pending:
+                        first_part, first_soup, first_lection = pending.pop(verse_id)
+                        self._merge_verse_parts(first_part, verse_part, first_soup)
+                        yield self._verse_entry(first_part, verse_id, first_lection)
+                    elif verse_part.get("part") == "I":
+                        pending[verse_id] = (verse_part, soup, lection)
+                    else:
+                        yield self._verse_entry(verse_part, verse_id, lection)
+
+            if ab_depth == 0:
+                self._release(elem)
+
+        # initial parts without followup part are transcribed on their own
+        for verse_id, (verse_part, _, lection) in pending.items():
+            yield self._verse_entry(verse_part, verse_id, lection)
+
+    @staticmethod
+    def _release(elem: etree.Element):
+        """Free an already processed element and its preceding siblings to keep memory flat
+
+        :param elem: lxml element which has been processed completely
+        """
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
@@ -0,0 +1,381 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+from normalization import (
+    normalize,
+    remove_diacritics,
+    remove_diacritics_nfkd,
+    remove_diacritics_series,
+)
+from tei_generator import MINUSCULE, NAMES, generate_tei
+from TEIFile import TEIFile
+from utils import (
+    bkv_nkv_from_verse_id,
+    bkv_nkv_from_verse_ids,
+    process_bkv,
+    search_words,
+)
+
+
+def best_of(func, repeat: int) -> float:
+    """Time a function and return the best of multiple runs in seconds
+
+    :param func: function without arguments to time
+    :param repeat: number of runs
+    :return: best runtime in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def bench_header_lookups(verse_counts: tuple = (100, 1000, 5000), repeat: int = 3):
+    """Compare get_transcription_list with the bare transcriptions to show the cost of the header lookups per row
+
+    :param verse_counts: sizes of the documents to benchmark
+    :param repeat: number of runs per size
+    """
+    print(
+        f"{'verses':>8} {'transcriptions':>15} {'transcription_list':>19} {'header/row':>12}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for verse_count in verse_counts:
+            file_path = Path(tmp_dir) / f"{verse_count}.xml"
+            file_path.write_text(generate_tei(verse_count, MINUSCULE), encoding="utf-8")
+            tei_files = [TEIFile(file_path, True, False) for _ in range(2 * repeat)]
+
+            # transcriptions modify the soup, so every run gets its own TEIFile
+            t_trans = best_of(lambda: tei_files.pop().transcriptions, repeat)
+            t_list = best_of(lambda: tei_files.pop().get_transcription_list(), repeat)
+            per_row = max(t_list - t_trans, 0) / verse_count
+            print(
+                f"{verse_count:>8} {t_trans:>14.4f}s {t_list:>18.4f}s {per_row * 1e6:>10.2f}µs"
+            )
+
+
+def bench_verse_references(row_counts: tuple = (1000, 10000), repeat: int = 3):
+    """Compare the row-wise bkv_nkv_from_verse_id with the column-wise bkv_nkv_from_verse_ids
+
+    :param row_counts: numbers of verse rows to benchmark, verse ids repeat like in a corpus of many manuscripts
+    :param repeat: number of runs per size
+    """
+    verse_ids = [
+        f"B{book:02d}K{chapter}V{verse}"
+        for book in (1, 4, 6)
+        for chapter in range(1, 21)
+        for verse in range(1, 41)
+    ]
+    verse_ids += ["Matt.1.1", "Rom.inscriptio", "B06KSubscriptioV0"]
+    print(f"{'rows':>8} {'apply':>10} {'vectorized':>11} {'speedup':>8}")
+    for row_count in row_counts:
+        verses = pd.DataFrame(
+            {"verse": [verse_ids[idx % len(verse_ids)] for idx in range(row_count)]}
+        )
+        t_apply = best_of(lambda: verses.apply(bkv_nkv_from_verse_id, axis=1), 1)
+        t_vectorized = best_of(lambda: bkv_nkv_from_verse_ids(verses["verse"]), repeat)
+        print(
+            f"{row_count:>8} {t_apply:>9.3f}s {t_vectorized:>10.4f}s {t_apply / t_vectorized:>7.0f}x"
+        )
+
+
+def bench_diacritics(char_counts: tuple = (10000, 1000000), repeat: int = 3):
+    """Compare the per character cost of removing diacritics by NFKD normalization and by the translation table, on a
+    whole text and word by word on a column
+
+    :param char_counts: lengths of the polytonic Greek texts to benchmark
+    :param repeat: number of runs per size
+    """
+    sample = "Ἐν ἀρχῇ ἦν ὁ λόγος, καὶ ὁ λόγος ἦν πρὸς τὸν θεόν, καὶ θεὸς ἦν ὁ λόγος. "
+    print(f"{'':>8} {'text':^33} {'words':^33}")
+    print(
+        f"{'chars':>8} {'nfkd':>12} {'table':>12} {'speedup':>7} {'nfkd':>12} {'table':>12} {'speedup':>7}"
+    )
+    for char_count in char_counts:
+        text = (sample * (char_count // len(sample) + 1))[:char_count]
+        words = pd.Series(text.split(" "))
+        timings = [
+            best_of(lambda: remove_diacritics_nfkd(text), repeat),
+            best_of(lambda: remove_diacritics(text), repeat),
+            best_of(lambda: words.map(remove_diacritics_nfkd), repeat),
+            best_of(lambda: remove_diacritics_series(words), repeat),
+        ]
+        t_text_nfkd, t_text_table, t_words_nfkd, t_words_table = (
+            t / char_count * 1e9 for t in timings
+        )
+        print(
+            f"{char_count:>8} {t_text_nfkd:>9.1f}ns/c {t_text_table:>9.1f}ns/c {t_text_nfkd / t_text_table:>6.1f}x "
+            f"{t_words_nfkd:>9.1f}ns/c {t_words_table:>9.1f}ns/c {t_words_nfkd / t_words_table:>6.1f}x"
+        )
+
+
+def peak_heap(func) -> int:
+    """Run a function once and return the peak of the memory allocated by Python meanwhile (see tracemalloc). Memory
+    allocated by C libraries like lxml is not traced.
+
+    :param func: function without arguments to measure
+    :return: peak memory in bytes
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _run_rss(func, connection):
+    """Run a function in a forked child process and send the growth of its peak resident set size
+
+    :param func: function without arguments to measure
+    :param connection: sending end of a pipe to the parent process
+    """
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func()
+    connection.send(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+
+
+def peak_rss(func) -> int:
+    """Run a function once in a forked child process and return how much its peak resident set size grew, so all memory
+    (the one of C libraries like lxml included) is counted for this function only
+
+    :param func: function without arguments to measure
+    :return: growth of the peak resident set size in bytes
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_rss, args=(func, sender))
+    process.start()
+    growth = receiver.recv()
+    process.join()
+    # ru_maxrss is given in kilobytes
+    return growth * 1024
+
+
+def measure(
+    benchmark: str, func, verse_count: int, byte_count: int or None, repeat: int
+) -> dict:
+    """Time a function (best of multiple runs) and measure its peak memory in extra runs, as measuring slows it down
+
+    :param benchmark: name of the benchmark
+    :param func: function without arguments to measure
+    :param verse_count: number of verses processed by a run
+    :param byte_count: number of bytes processed by a run or None if not meaningful
+    :param repeat: number of timed runs
+    :return: dictionary of the benchmark, verses, seconds, throughput (verses/s, MB/s), peak resident set size growth
+        (MB) and peak Python heap (MB)
+    """
+    seconds = best_of(func, repeat)
+    return {
+        "benchmark": benchmark,
+        "verses": verse_count,
+        "seconds": seconds,
+        "verses/s": verse_count / seconds,
+        "MB/s": byte_count / seconds / 1e6 if byte_count is not None else None,
+        "peak RSS MB": peak_rss(func) / 1e6,
+        "Python heap peak MB": peak_heap(func) / 1e6,
+    }
+
+
+def get_name_variants() -> pd.DataFrame:
+    """Get the names of the generated documents as word list in the form of 02_get_words
+
+    :return: pandas dataframe of the variants (variant,wordID,variantID)
+    """
+    variants = [
+        (normalize(variant), word_id)
+        for word_id, word_variants in enumerate(NAMES.values())
+        for variant in word_variants
+    ]
+    return pd.DataFrame(
+        {
+            "variant": [variant for variant, _ in variants],
+            "wordID": [word_id for _, word_id in variants],
+            "variantID": range(len(variants)),
+        }
+    )
+
+
+def bench_suite(verse_counts: tuple = (500, 2000, 5000), repeat: int = 3) -> list:
+    """Measure the stages of parsing and searching on generated lectionaries of several sizes: reading a document
+    (parsing included) with TEIFile.transcriptions and get_transcription_list, converting the verse references with
+    bkv_nkv_from_verse_id and bkv_nkv_from_verse_ids, searching the verses with search_words and searching every bkv
+    with process_bkv
+
+    :param verse_counts: numbers of verses of the documents to benchmark
+    :param repeat: number of timed runs per benchmark and size
+    :return: list of the results (see measure)
+    """
+    words = get_name_variants()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for verse_count in verse_counts:
+            file_path = Path(tmp_dir) / f"{verse_count}.xml"
+            file_path.write_text(generate_tei(verse_count), encoding="utf-8")
+            file_size = file_path.stat().st_size
+
+            results.append(
+                measure(
+                    "TEIFile.transcriptions",
+                    lambda: TEIFile(file_path, True, False).transcriptions,
+                    verse_count,
+                    file_size,
+                    repeat,
+                )
+            )
+            results.append(
+                measure(
+                    "TEIFile.get_transcription_list",
+                    lambda: TEIFile(file_path, True, False).get_transcription_list(),
+                    verse_count,
+                    file_size,
+                    repeat,
+                )
+            )
+
+            verses = pd.DataFrame(TEIFile(file_path, True, False).transcriptions)
+            verses["verse_id"] = range(len(verses))
+            # split verses are merged, so the rows are counted instead of the generated verses
+            row_count = len(verses)
+            results.append(
+                measure(
+                    "bkv_nkv_from_verse_id",
+                    lambda: verses.apply(bkv_nkv_from_verse_id, axis=1),
+                    row_count,
+                    None,
+                    1,
+                )
+            )
+            results.append(
+                measure(
+                    "bkv_nkv_from_verse_ids",
+                    lambda: bkv_nkv_from_verse_ids(verses["verse"]),
+                    row_count,
+                    None,
+                    repeat,
+                )
+            )
+
+            verses[["bkv", "nkv"]] = bkv_nkv_from_verse_ids(verses["verse"])
+            text_size = verses["text"].str.encode("utf-8").str.len().sum()
+            results.append(
+                measure(
+                    "search_words",
+                    lambda: search_words(words, verses.copy(), engine="token"),
+                    row_count,
+                    text_size,
+                    repeat,
+                )
+            )
+            # every bkv filters all verses, so like the row-wise apply it is timed once
+            out_dir = os.path.join(tmp_dir, f"occurrences_{verse_count}")
+            results.append(
+                measure(
+                    "process_bkv",
+                    lambda: [
+                        process_bkv(bkv, out_dir, verses, words, engine="token")
+                        for bkv in verses["bkv"].unique()
+                    ],
+                    row_count,
+                    text_size,
+                    1,
+                )
+            )
+    return results
+
+
+def print_results(results: list, baseline: list or None = None, tolerance: float = 0.2):
+    """Print the results of bench_suite, compared with the throughput of a baseline if given
+
+    :param results: list of results (see measure)
+    :param baseline: list of results of an earlier run or None
+    :param tolerance: share of throughput a benchmark may lose against the baseline before being marked as regression
+    """
+    baseline = {
+        (result["benchmark"], result["verses"]): result for result in baseline or []
+    }
+    print(
+        f"{'benchmark':<31} {'verses':>7} {'seconds':>9} {'verses/s':>10} {'MB/s':>7} {'RSS MB':>7} {'heap MB':>8} {'baseline':>9}"
+    )
+    for result in results:
+        mb_per_s = f"{result['MB/s']:.2f}" if result["MB/s"] is not None else "-"
+        line = (
+            f"{result['benchmark']:<31} {result['verses']:>7} {result['seconds']:>9.4f} {result['verses/s']:>10.0f} "
+            f"{mb_per_s:>7} {result['peak RSS MB']:>7.1f} {result['Python heap peak MB']:>8.1f}"
+        )
+        previous = baseline.get((result["benchmark"], result["verses"]))
+        if previous is not None:
+            ratio = result["verses/s"] / previous["verses/s"]
+            line += f" {ratio:>8.2f}x"
+            if ratio < 1 - tolerance:
+                line += " REGRESSION"
+        print(line)
+
+
+BENCHMARKS = {
+    "header": bench_header_lookups,
+    "references": bench_verse_references,
+    "diacritics": bench_diacritics,
+    "suite": bench_suite,
+}
+
+
+def main(argv: list = None):
+    """Command line interface of the benchmarks, run 'python benchmark.py --help' from the notebooks directory
+
+    :param argv: command line arguments, sys.argv if None
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark parsing and searching on generated TEI documents"
+    )
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help=f"benchmarks to run, all benchmarks if none given: {', '.join(BENCHMARKS)}",
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[500, 2000, 5000],
+        help="numbers of verses of the documents of the suite",
+    )
+    parser.add_argument("--output", help="JSON file to write the suite results to")
+    parser.add_argument(
+        "--baseline",
+        help="JSON file of earlier suite results to compare the throughput with",
+    )
+    args = parser.parse_args(argv)
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"# {name}")
+        if name != "suite":
+            BENCHMARKS[name]()
+            continue
+        results = bench_suite(tuple(args.scales))
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        print_results(results, baseline)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
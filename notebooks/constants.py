@@ -28,3 +28,32 @@ BOOK_INFO = {
     "26": {"de": "", "en": "Jude"},
     "27": {"de": "", "en": "Rev"},
 }
+
+# Reverse lookup of the book numbers by their english abbreviation
+BOOK_NUMBERS_EN = {value["en"]: key for key, value in BOOK_INFO.items()}
+
+# SPARQL endpoint of DBpedia and query of its Greek New Testament manuscripts (see 03_3_sparql)
+DBPEDIA_SPARQL_ENDPOINT = "http://dbpedia.org/sparql"
+DBPEDIA_SPARQL_QUERY = """
+PREFIX dcterms: <http://purl.org/dc/terms/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+PREFIX dbc: <http://dbpedia.org/resource/Category:>
+
+SELECT DISTINCT ?entry ?entryLabel ?form ?number ?found
+WHERE {
+	VALUES ?concept {
+		dbc:Greek_New_Testament_lectionaries
+		dbc:Greek_New_Testament_minuscules
+		dbc:Greek_New_Testament_uncials
+		dbc:New_Testament_papyri
+	}
+	?entry dcterms:subject ?concept .
+
+	OPTIONAL{?entry rdfs:label ?entryLabel}
+	OPTIONAL{?entry dbp:form ?form}
+	OPTIONAL{?entry dbp:number ?number}
+	OPTIONAL{?entry dbp:found ?found}
+
+	FILTER (langMatches(lang(?entryLabel), "en"))
+}
+"""
@@ -1,10 +1,11 @@
+import numpy as np
 import pandas as pd
 import re
 from constants import BOOK_INFO
 
 
 def docID_to_ga(doc_id: int) -> str or None:
-    """Convert a docID to a GA string
+    """Convert a docID to a GA string, for whole columns use docIDs_to_gas
 
     :param doc_id: docID integer value
     :return: GA string or NONE
@@ -57,3 +58,123 @@ def string_to_list(value):
         return list(alt_set)
     else:
         return value  # If not a string, return the original value
+
+
+def bkvs_to_nkvs(bkvs: pd.Series) -> pd.Series:
+    """Column-wise version of bkv_to_nkv, converting bkv values to nkv
+
+    Every unique bkv is matched once, so the cost depends on the number of different verses, not on the number of
+    rows.
+
+    :param bkvs: pandas series of bkv strings
+    :return: pandas series of nkv strings or None
+    """
+    codes, uniques = pd.factorize(bkvs)
+    groups = pd.Series(uniques, dtype="object").str.extract(r"^B(\d{2})K(\d+)V(\d+)")
+    book_abb_en = groups[0].map({key: value["en"] for key, value in BOOK_INFO.items()})
+    nkvs = (book_abb_en + "." + groups[1] + "." + groups[2]).to_numpy(dtype="object")
+    nkvs = np.append(np.where(pd.isna(nkvs), None, nkvs), None)
+    return pd.Series(nkvs[codes], index=bkvs.index, dtype="object")
+
+
+# GA prefix of the manuscript categories, the first digit of their docIDs (minuscules have no prefix)
+CATEGORY_PREFIXES = {1: "P", 2: "0", 3: "", 4: "L"}
+# manuscript category of the manuscript forms (as named by DBpedia)
+FORM_CATEGORIES = {"Papyrus": 1, "Uncial": 2, "Minuscule": 3, "Lectionary": 4}
+# GA string like ga_to_docID reads it: a P or L prefix followed by the first digits after it (like "L 329"), or
+# digits only (uncials start with 0). A suffix is ignored, the number has up to four digits.
+GA_PATTERN = re.compile(r"^(?:([PL])\D*|(?=\d))(\d{1,4})(?!\d)")
+
+
+def _build_docID_gas() -> np.ndarray:
+    """Build the GA strings of all docIDs, so converting docIDs is a lookup
+
+    :return: numpy object array of the GA string of every docID (index), None for invalid docIDs
+    """
+    docID_gas = np.full(50000, None, dtype="object")
+    for category, prefix in CATEGORY_PREFIXES.items():
+        docID_gas[category * 10000 + 1 : (category + 1) * 10000] = [
+            f"{prefix}{number}" for number in range(1, 10000)
+        ]
+    return docID_gas
+
+
+DOCID_GAS = _build_docID_gas()
+
+
+def _to_float_array(values: pd.Series) -> np.ndarray:
+    """Convert a column of numbers (also as strings) to a float array, values not convertible become NaN
+
+    :param values: pandas series
+    :return: numpy float array
+    """
+    return pd.to_numeric(values, errors="coerce").astype("float64").to_numpy()
+
+
+def _lookup_gas(docIDs: np.ndarray, index: pd.Index) -> pd.Series:
+    """Look up the GA strings of docIDs in DOCID_GAS
+
+    :param docIDs: numpy float array of docIDs
+    :param index: index of the resulting series
+    :return: pandas series of GA strings, missing for invalid docIDs
+    """
+    valid = (docIDs == np.floor(docIDs)) & (docIDs >= 0) & (docIDs < len(DOCID_GAS))
+    gas = DOCID_GAS[np.where(valid, docIDs, 0).astype(np.int64)]
+    return pd.Series(gas, index=index, dtype="string")
+
+
+def docIDs_to_gas(docIDs: pd.Series) -> (pd.Series, pd.Series):
+    """Column-wise version of docID_to_ga, converting docIDs to GA strings
+
+    Valid docIDs are the integers from 10001 to 49999 (also given as strings or floats), their first digit is the
+    category of the manuscript (1 papyrus, 2 uncial, 3 minuscule, 4 lectionary) and the other digits its number.
+
+    :param docIDs: pandas series of docIDs
+    :return: tuple of pandas series of GA strings (missing if invalid) and boolean mask of the invalid docIDs
+    """
+    gas = _lookup_gas(_to_float_array(docIDs), docIDs.index)
+    return gas, docIDs.notna() & gas.isna()
+
+
+def gas_to_docIDs(gas: pd.Series) -> (pd.Series, pd.Series):
+    """Column-wise version of ga_to_docID (without falling back to a docID column), converting GA strings to docIDs
+
+    A GA starting with P is a papyrus, with L a lectionary, with 0 an uncial and with any other digit a minuscule. Its
+    number is the first run of digits (after the prefix), has at most four digits (the leading 0 of uncials included)
+    and is above 0. Other GA strings, like lower case prefixes on which ga_to_docID raises, are invalid. Every unique GA
+    is matched once.
+
+    :param gas: pandas series of GA strings
+    :return: tuple of pandas series of docIDs (Int32, missing if invalid) and boolean mask of the invalid GA strings
+    """
+    codes, uniques = pd.factorize(gas)
+    groups = pd.Series(uniques, dtype="object").astype(str).str.extract(GA_PATTERN)
+    numbers = _to_float_array(groups[1])
+    categories = np.select(
+        [
+            (groups[0] == "P").to_numpy(),
+            (groups[0] == "L").to_numpy(),
+            groups[1].str.startswith("0", na=False).to_numpy(),
+        ],
+        [1, 4, 2],
+        default=3,
+    )
+    docIDs = np.where(numbers > 0, categories * 10000 + numbers, np.nan)
+    docIDs = pd.array(np.append(docIDs, np.nan), dtype="Int32")[codes]
+    docIDs = pd.Series(docIDs, index=gas.index)
+    return docIDs, gas.notna() & docIDs.isna()
+
+
+def forms_to_gas(forms: pd.Series, numbers: pd.Series) -> (pd.Series, pd.Series):
+    """Build GA strings of the manuscript forms (see FORM_CATEGORIES) and numbers, like '046' for the uncial 46
+
+    :param forms: pandas series of manuscript forms
+    :param numbers: pandas series of manuscript numbers
+    :return: tuple of pandas series of GA strings (missing if a form or number is missing or invalid) and boolean mask
+        of the rows with form and number given, but invalid
+    """
+    categories = forms.map(FORM_CATEGORIES).astype("float64").to_numpy()
+    values = _to_float_array(numbers)
+    docIDs = np.where(values < 10000, categories * 10000 + values, np.nan)
+    gas = _lookup_gas(docIDs, forms.index)
+    return gas, forms.notna() & numbers.notna() & gas.isna()
@@ -0,0 +1,127 @@
+import os
+import pandas as pd
+
+# default directory of the corpus tables
+DATA_DIR = "../data"
+
+# column types of the corpus tables, repeating strings (like ga, publisher, source or bkv) are stored dictionary
+# encoded as categories
+TABLES = {
+    "verses": {
+        "lection": "category",
+        "transcript": "string",
+        "publisher": "category",
+        "source": "category",
+        "ga": "category",
+        "sponsor": "category",
+        "founder": "category",
+        "edition_version": "float",
+        "edition_date": "category",
+        "publishing_date": "category",
+        "encoding_version": "float",
+        "bkv": "category",
+        "nkv": "category",
+        "text": "string",
+        "verse_id": "int64",
+        "verse_key": "Int32",
+    },
+    "words": {
+        "label:en": "string",
+        "gender": "category",
+        "label:el:norm": "string",
+        "factgrid": "string",
+        "variant": "string",
+        "type": "category",
+        "wordID": "int64",
+        "variantID": "int64",
+    },
+    "manuscripts": {
+        "docID": "string",
+        "pagesCount": "Int64",
+        "leavesCount": "Int64",
+        "ga": "string",
+        "century": "category",
+        "source": "category",
+        "label": "string",
+        "dbpedia": "string",
+    },
+}
+
+
+def get_table_path(name: str, data_dir: str = DATA_DIR) -> str:
+    """Get the path of the parquet file of a corpus table
+
+    :param name: name of the table (see TABLES)
+    :param data_dir: directory of the corpus tables
+    :return: path string of the parquet file
+    """
+    if name not in TABLES:
+        raise ValueError(f"Unknown table: {name}")
+    return f"{data_dir}/{name}.parquet"
+
+
+def write_table(df: pd.DataFrame, name: str, data_dir: str = DATA_DIR):
+    """Write a dataframe as typed and compressed corpus table
+
+    :param df: pandas dataframe holding the table
+    :param name: name of the table (see TABLES)
+    :param data_dir: directory of the corpus tables
+    :return:
+    """
+    path = get_table_path(name, data_dir)
+    os.makedirs(data_dir, exist_ok=True)
+    dtypes = {col: dtype for col, dtype in TABLES[name].items() if col in df.columns}
+    df.astype(dtypes).to_parquet(path, index=False, compression="zstd")
+
+
+def convert_csv(name: str, data_dir: str = DATA_DIR):
+    """Convert the CSV file of a corpus table (like ../data/verses.csv) to a corpus table
+
+    :param name: name of the table (see TABLES)
+    :param data_dir: directory of the corpus tables and CSV files
+    :return:
+    """
+    df = pd.read_csv(f"{data_dir}/{name}.csv", low_memory=False)
+    write_table(df, name, data_dir)
+
+
+def load_table(
+    name: str,
+    columns: list = None,
+    ga: list = None,
+    book: list = None,
+    filters: list = None,
+    data_dir: str = DATA_DIR,
+) -> pd.DataFrame:
+    """Load a corpus table, reading only the given columns and rows
+
+    :param name: name of the table (see TABLES)
+    :param columns: columns to read, all columns if None
+    :param ga: only read rows of these GA numbers
+    :param book: only read rows of these book numbers (like "01" for Matthew, see constants.BOOK_INFO), uses bkv
+    :param filters: further row filters in pyarrow format, e.g. [("source", "==", "ntvmr")]
+    :param data_dir: directory of the corpus tables
+    :return: pandas dataframe holding the table
+    """
+    filters = list(filters) if filters else []
+    if ga is not None:
+        filters.append(("ga", "in", list(ga)))
+
+    # the book is encoded in the bkv, which therefore has to be read too
+    read_columns = columns
+    if book is not None and columns is not None and "bkv" not in columns:
+        read_columns = list(columns) + ["bkv"]
+
+    df = pd.read_parquet(
+        get_table_path(name, data_dir),
+        columns=read_columns,
+        filters=filters or None,
+    )
+
+    if book is not None:
+        df = df[df["bkv"].astype("string").str[1:3].isin(list(book))]
+        if read_columns is not columns:
+            df = df.drop(columns=["bkv"])
+        df = df.reset_index(drop=True)
+
+    return df
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class DownloadCache(object):
+    """Manifest of downloaded documents to refresh a corpus incrementally
+
+    For every document (keyed by the name of its file without suffix, i.e. the docID) the ETag and Last-Modified
+    headers of the last response and the hash of the written content are stored. They are used for conditional
+    requests, so a document is only rewritten if it changed. The documents changed in the current run are reported
+    in the manifest too, to limit the parsing of the corpus to them.
+    """
+
+    def __init__(self, manifest_file: str):
+        """
+        :param manifest_file: path of the JSON manifest file, created on save if it does not exist
+        """
+        self._manifest_file = manifest_file
+        self._lock = threading.Lock()
+        self._changed = set()
+        self._documents = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                self._documents = json.load(f).get("documents", {})
+
+    @property
+    def changed(self) -> set:
+        """Property returning the keys of the documents written in this run because they are new or changed
+
+        :return: set of keys (docIDs as strings)
+        """
+        return set(self._changed)
+
+    @staticmethod
+    def get_key(output_file: str) -> str:
+        """Get the manifest key of a document
+
+        :param output_file: path of the file the document is written to
+        :return: file name without suffix
+        """
+        return Path(output_file).stem
+
+    def request_headers(self, output_file: str) -> dict:
+        """Get the headers of a conditional request for a document
+
+        :param output_file: path of the file the document is written to
+        :return: dictionary of If-None-Match and If-Modified-Since headers, empty if the file has to be fetched
+        """
+        entry = self._documents.get(self.get_key(output_file))
+        if entry is None or not os.path.exists(output_file):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, output_file: str, headers: dict, content: str) -> bool:
+        """Store the validators and content hash of a fetched document
+
+        :param output_file: path of the file the document is written to
+        :param headers: headers of the response
+        :param content: content to write to the file
+        :return: True if the file has to be written, because it is missing or its content changed
+        """
+        key = self.get_key(output_file)
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._documents.get(key, {})
+            changed = entry.get("sha256") != content_hash or not os.path.exists(
+                output_file
+            )
+            self._documents[key] = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "sha256": content_hash,
+            }
+            if changed:
+                self._changed.add(key)
+        return changed
+
+    def save(self):
+        """Write the manifest file"""
+        with self._lock:
+            manifest = {
+                "documents": self._documents,
+                "changed": sorted(self._changed),
+            }
+            os.makedirs(os.path.dirname(self._manifest_file) or ".", exist_ok=True)
+            with open(self._manifest_file, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=4)
@@ -0,0 +1,119 @@
+import json
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlparse
+
+
+def get_error_record(
+    url: str, reason: str, status: int = None, attempt: int = None
+) -> dict:
+    """Build the structured record of a failed download
+
+    :param url: Url string which produced an error
+    :param reason: the error text
+    :param status: HTTP status code of the response, None if there was no response
+    :param attempt: number of attempts made, None if unknown
+    :return: dictionary of docID, url, status, reason, attempt and timestamp
+    """
+    docID = parse_qs(urlparse(url).query).get("docID", [None])[0]
+    return {
+        "docID": int(docID) if docID and docID.isdigit() else None,
+        "url": url,
+        "status": status,
+        "reason": reason,
+        "attempt": attempt,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class ErrorLog(object):
+    """Central sink of the error records of parallel downloads
+
+    Workers only put records into a queue, which is drained by a single thread of the parent writing them as JSON lines
+    to the log file, so lines never interleave and the file is opened once. Threads can share the ErrorLog itself,
+    processes get it pickled with a queue of a multiprocessing.Manager.
+    """
+
+    def __init__(self, error_log_file: str, record_queue=None):
+        """
+        :param error_log_file: path to the log file, records are appended
+        :param record_queue: queue of the records (e.g. multiprocessing.Manager().Queue()), a queue.Queue if None
+        """
+        self.error_log_file = error_log_file
+        self.queue = record_queue if record_queue is not None else queue.Queue()
+        self._writer = None
+
+    def __getstate__(self) -> dict:
+        # workers only need the queue, the writer thread stays with the parent
+        return {"error_log_file": self.error_log_file, "queue": self.queue}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._writer = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def log(self, url: str, reason: str, status: int = None, attempt: int = None):
+        """Add the record of a failed download to the log
+
+        :param url: Url string which produced an error
+        :param reason: the error text
+        :param status: HTTP status code of the response, None if there was no response
+        :param attempt: number of attempts made, None if unknown
+        """
+        self.queue.put(get_error_record(url, reason, status, attempt))
+
+    def start(self):
+        """Start the thread writing the records to the log file"""
+        os.makedirs(os.path.dirname(self.error_log_file) or ".", exist_ok=True)
+        self._writer = threading.Thread(target=self._write_records, daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        """Write all remaining records and stop the writing thread"""
+        self.queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def _write_records(self):
+        """Drain the queue until the stop marker (None), flushing whenever the queue is empty"""
+        with open(self.error_log_file, "a", encoding="utf-8") as error_log:
+            while True:
+                record = self.queue.get()
+                if record is None:
+                    break
+                error_log.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if self.queue.empty():
+                    error_log.flush()
+
+
+def read_error_log(error_log_file: str) -> list[dict]:
+    """Read the records of an error log, lines of the former 'url; reason' format are read as records too
+
+    :param error_log_file: path to the log file
+    :return: list of records
+    """
+    records = []
+    if not os.path.exists(error_log_file):
+        return records
+
+    with open(error_log_file, "r", encoding="utf-8") as error_log:
+        for line in error_log:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                url, _, reason = line.partition("; ")
+                record = get_error_record(url, reason)
+                record["timestamp"] = None
+                records.append(record)
+    return records
@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+
+# status codes of responses worth another attempt (rate limited or temporary server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter(object):
+    """Token bucket rate limiter per host, shared by all threads of a download"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: number of requests per second allowed per host
+        :param burst: number of requests allowed at once after a pause
+        """
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        # host -> (tokens, time of last update)
+        self._buckets = {}
+
+    def acquire(self, host: str):
+        """Take a token of the hosts bucket, waiting until one is available
+
+        :param host: host the request is sent to
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            # the token is taken now, a negative balance is the time to wait for it
+            tokens -= 1
+            self._buckets[host] = (tokens, now)
+        if tokens < 0:
+            time.sleep(-tokens / self.rate)
+
+
+class RetryAdapter(HTTPAdapter):
+    """HTTP adapter retrying failed requests with jittered exponential backoff
+
+    Connection errors, timeouts and responses with a status of RETRY_STATUSES are retried. Every attempt takes a token
+    of the rate limiter (if given) and requests without an explicit timeout get the default timeout.
+    """
+
+    def __init__(
+        self,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 60,
+        timeout: float = 60,
+        rate_limiter: RateLimiter = None,
+        **kwargs,
+    ):
+        """
+        :param retries: number of retries after the first attempt
+        :param backoff_factor: base of the backoff in seconds, doubled with every retry
+        :param backoff_max: maximum backoff in seconds
+        :param timeout: default timeout of the requests in seconds
+        :param rate_limiter: rate limiter shared by all adapters of a download, no limit if None
+        :param kwargs: arguments of HTTPAdapter (e.g. pool_maxsize)
+        """
+        super().__init__(**kwargs)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+
+    def get_backoff(self, attempt: int, response: requests.Response = None) -> float:
+        """Get the time to wait before the next attempt (full jitter), at least as long as a Retry-After header asks
+
+        :param attempt: number of the failed attempt, starting with 1
+        :param response: response of the failed attempt, None on connection errors and timeouts
+        :return: time to wait in seconds
+        """
+        backoff = random.uniform(
+            0, min(self.backoff_max, self.backoff_factor * 2 ** (attempt - 1))
+        )
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        if retry_after and retry_after.isdigit():
+            backoff = max(backoff, min(self.backoff_max, int(retry_after)))
+        return backoff
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        host = urlparse(request.url).netloc
+
+        attempt = 1
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(host)
+            response = None
+            try:
+                response = super().send(request, **kwargs)
+                # the number of attempts is kept for the error log
+                response.attempt = attempt
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt > self.retries:
+                    e.attempt = attempt
+                    raise
+            if attempt > self.retries:
+                return response
+            backoff = self.get_backoff(attempt, response)
+            if response is not None:
+                response.close()
+            time.sleep(backoff)
+            attempt += 1
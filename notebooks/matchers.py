@@ -0,0 +1,229 @@
+import pandas as pd
+import re
+
+# a token is a maximal run of word characters, so a variant consisting only of word characters matches a text at
+# word boundaries exactly when it equals one of the texts tokens
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def is_word_char(c: str) -> bool:
+    """Check if a character is a word character in the sense of the regular expression \\w (for str patterns)
+
+    :param c: single character
+    :return: True if c is a word character
+    """
+    return c.isalnum() or c == "_"
+
+
+def is_word_boundary(text: str, position: int) -> bool:
+    """Check if a position in a text is a word boundary in the sense of the regular expression \\b
+
+    :param text: text to check
+    :param position: index between two characters (0 is the start, len(text) the end of the text)
+    :return: True if there is a word boundary at position
+    """
+    before = position > 0 and is_word_char(text[position - 1])
+    after = position < len(text) and is_word_char(text[position])
+    return before != after
+
+
+def get_variant_ids(words: pd.DataFrame) -> dict:
+    """Map every variant of a vocabulary to the variantIDs and wordIDs it belongs to
+
+    :param words: pandas dataframe holding word variants (variant,wordID,variantID)
+    :return: dictionary of variant and set of (variantID, wordID) tuples
+    """
+    variant_ids = {}
+    for variant, variant_id, word_id in zip(
+        words["variant"], words["variantID"], words["wordID"]
+    ):
+        if pd.notnull(variant):
+            variant_ids.setdefault(variant, set()).add((variant_id, word_id))
+    return variant_ids
+
+
+class RegexMatcher(object):
+    """Matcher finding all word variants of a vocabulary in a verse text by searching every variant on its own with
+    re.search(rf"\\b{re.escape(variant)}\\b", text)
+    """
+
+    def __init__(self, words: pd.DataFrame):
+        """
+        :param words: pandas dataframe holding word variants (variant,wordID,variantID)
+        """
+        # list of (compiled pattern, set of (variantID, wordID) tuples)
+        self._patterns = [
+            (re.compile(rf"\b{re.escape(variant)}\b"), ids)
+            for variant, ids in get_variant_ids(words).items()
+        ]
+
+    def find(self, text: str) -> set:
+        """Find all variants in a text
+
+        :param text: text to search in
+        :return: set of (variantID, wordID) tuples of the variants found
+        """
+        found = set()
+        for pattern, ids in self._patterns:
+            if pattern.search(text):
+                found.update(ids)
+        return found
+
+
+class AhoCorasick(object):
+    """Aho-Corasick automaton to find all occurrences of many patterns in a text with a single scan of the text"""
+
+    def __init__(self, patterns: list[str]):
+        # goto function, failure links and output (pattern indices) of every node, node 0 is the root
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._patterns = list(patterns)
+
+        for pattern_idx, pattern in enumerate(self._patterns):
+            self._insert(pattern, pattern_idx)
+        self._build_failure_links()
+
+    @property
+    def patterns(self) -> list[str]:
+        """Property returning the patterns of the automaton
+
+        :return: list of patterns, the index of a pattern is the one given in the matches
+        """
+        return self._patterns
+
+    def _insert(self, pattern: str, pattern_idx: int):
+        """Add a pattern to the trie of the automaton
+
+        :param pattern: pattern string
+        :param pattern_idx: index of the pattern
+        """
+        node = 0
+        for c in pattern:
+            if c not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][c] = len(self._goto) - 1
+            node = self._goto[node][c]
+        self._out[node].append(pattern_idx)
+
+    def _build_failure_links(self):
+        """Compute the failure links (breadth first) and merge the outputs reachable by them"""
+        queue = list(self._goto[0].values())
+        while queue:
+            next_queue = []
+            for node in queue:
+                for c, child in self._goto[node].items():
+                    fail = self._fail[node]
+                    while fail and c not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    self._fail[child] = self._goto[fail].get(c, 0)
+                    self._out[child] = self._out[child] + self._out[self._fail[child]]
+                    next_queue.append(child)
+            queue = next_queue
+
+    def iter_matches(self, text: str):
+        """Generator yielding all (also overlapping) occurrences of the patterns in the text
+
+        :param text: text to search in
+        :return: generator of tuples of start index, end index and pattern index
+        """
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        node = 0
+        for end, c in enumerate(text, start=1):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            for pattern_idx in out[node]:
+                yield end - len(patterns[pattern_idx]), end, pattern_idx
+
+
+class VariantMatcher(object):
+    """Matcher finding all word variants of a vocabulary in a verse text with a single scan of the text
+
+    A variant matches under the same conditions as re.search(rf"\\b{re.escape(variant)}\\b", text), i.e. at Unicode
+    (Greek) word boundaries.
+    """
+
+    def __init__(self, words: pd.DataFrame):
+        """
+        :param words: pandas dataframe holding word variants (variant,wordID,variantID)
+        """
+        # variant -> set of (variantID, wordID) tuples
+        variant_ids = get_variant_ids(words)
+
+        # an empty variant matches every word boundary, it cannot be represented in the automaton
+        self._empty_ids = variant_ids.pop("", set())
+        self._automaton = AhoCorasick(list(variant_ids.keys()))
+        self._ids = [variant_ids[variant] for variant in self._automaton.patterns]
+
+    def find(self, text: str) -> set:
+        """Find all variants in a text
+
+        :param text: text to search in
+        :return: set of (variantID, wordID) tuples of the variants found
+        """
+        found = set()
+        matched_patterns = set()
+        for start, end, pattern_idx in self._automaton.iter_matches(text):
+            if (
+                pattern_idx not in matched_patterns
+                and is_word_boundary(text, start)
+                and is_word_boundary(text, end)
+            ):
+                matched_patterns.add(pattern_idx)
+                found.update(self._ids[pattern_idx])
+        if self._empty_ids and any(
+            is_word_boundary(text, position) for position in range(len(text) + 1)
+        ):
+            found.update(self._empty_ids)
+        return found
+
+
+class TokenMatcher(object):
+    """Matcher finding all word variants of a vocabulary in a verse text by looking up the tokens of the text
+
+    Variants consisting of a single token are found by a hash lookup of the tokens of the text. All other variants
+    (e.g. consisting of multiple tokens) fall back to a phrase check by regular expression. A variant matches under the
+    same conditions as re.search(rf"\\b{re.escape(variant)}\\b", text).
+    """
+
+    def __init__(self, words: pd.DataFrame):
+        """
+        :param words: pandas dataframe holding word variants (variant,wordID,variantID)
+        """
+        # token -> set of (variantID, wordID) tuples
+        self._token_ids = {}
+        # list of (compiled phrase pattern, set of (variantID, wordID) tuples)
+        self._phrases = []
+
+        for variant, ids in get_variant_ids(words).items():
+            if TOKEN_PATTERN.fullmatch(variant):
+                self._token_ids[variant] = ids
+            else:
+                self._phrases.append((re.compile(rf"\b{re.escape(variant)}\b"), ids))
+
+    def find(self, text: str) -> set:
+        """Find all variants in a text
+
+        :param text: text to search in
+        :return: set of (variantID, wordID) tuples of the variants found
+        """
+        found = set()
+        for token in set(TOKEN_PATTERN.findall(text)):
+            ids = self._token_ids.get(token)
+            if ids:
+                found.update(ids)
+        for pattern, ids in self._phrases:
+            if pattern.search(text):
+                found.update(ids)
+        return found
+
+
+# search engines of search_words and their matcher classes
+MATCHERS = {
+    "regex": RegexMatcher,
+    "aho-corasick": VariantMatcher,
+    "token": TokenMatcher,
+}
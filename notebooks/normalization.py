@@ -0,0 +1,120 @@
+import re
+import unicodedata
+import pandas as pd
+
+
+def remove_diacritics_nfkd(s: str) -> str:
+    """Remove diacritics by NFKD normalization and dropping all non-spacing marks (category 'Mn'), character by
+    character in Python
+
+    :param s: string to normalize
+    :return: string without diacritics
+    """
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", s) if unicodedata.category(c) != "Mn"
+    )
+
+
+def _build_table() -> (list, re.Pattern):
+    """Precompute the table to remove diacritics at C level
+
+    The translation table holds the result of remove_diacritics_nfkd for every character of the Basic Multilingual
+    Plane (polytonic Greek, Latin and all common combining marks included). Translating character by character equals
+    remove_diacritics_nfkd, as long as no combining character is left, which would be reordered by the normalization.
+    The few characters leaving one (spacing combining marks) and the characters outside of the table are matched by the
+    returned pattern.
+
+    :return: tuple of translation table (indexed by code point) and pattern of the characters the table does not
+        cover
+    """
+    table = [chr(code_point) for code_point in range(0x10000)]
+    uncovered = []
+    for code_point, c in enumerate(table):
+        normalized = remove_diacritics_nfkd(c)
+        if normalized != c:
+            table[code_point] = normalized
+        if any(unicodedata.combining(n) for n in normalized):
+            uncovered.append(re.escape(c))
+    return table, re.compile(f"[{''.join(uncovered)}\U00010000-\U0010ffff]")
+
+
+# translation table (str.translate) and the characters it does not cover
+DIACRITICS_TABLE, UNCOVERED_PATTERN = _build_table()
+
+
+def remove_diacritics(s: str) -> str:
+    """Remove diacritics (accents, breathings, iota subscripts, ...) from a string with the precomputed translation
+    table, giving the same result as remove_diacritics_nfkd
+
+    :param s: string to normalize
+    :return: string without diacritics
+    """
+    if s.isascii():
+        return s
+    if UNCOVERED_PATTERN.search(s):
+        return remove_diacritics_nfkd(s)
+    return s.translate(DIACRITICS_TABLE)
+
+
+def remove_diacritics_series(values: pd.Series) -> pd.Series:
+    """Remove diacritics from a column of strings, giving the same result as remove_diacritics_nfkd
+
+    :param values: pandas series of strings
+    :return: pandas series of strings without diacritics, missing values stay missing
+    """
+    return values.map(remove_diacritics, na_action="ignore")
+
+
+def normalize(s: str) -> str:
+    """Normalize a string to the form of the transcripts: without diacritics and lower case
+
+    :param s: string to normalize
+    :return: normalized string
+    """
+    return remove_diacritics(s).lower()
+
+
+def normalize_series(values: pd.Series) -> pd.Series:
+    """Normalize a column of strings to the form of the transcripts: without diacritics and lower case
+
+    :param values: pandas series of strings
+    :return: pandas series of normalized strings, missing values stay missing
+    """
+    return values.map(normalize, na_action="ignore")
+
+
+# bracketed GAP markers of the transcripts (like "[gap-unclear-damagetopage-1-ω]") and the characters dropped of them
+GAP_PATTERN = re.compile(r"\[([^\]]*)\]")
+NON_GREEK_PATTERN = re.compile(r"[^Α-Ωα-ω]+")
+
+
+def _gap_text(match: re.Match) -> str:
+    """Keep only the Greek characters of a GAP marker
+
+    :param match: match of GAP_PATTERN
+    :return: Greek characters inside the brackets
+    """
+    return NON_GREEK_PATTERN.sub("", match.group(1))
+
+
+def gap_clean(text: str) -> str:
+    """Removes everything inside brackets except Greek characters, also removes the brackets.
+
+    :param text: Input string containing text with brackets
+    :return: Cleaned string with only Greek characters inside the brackets
+    """
+    try:
+        if "[" not in text:
+            return text
+        return GAP_PATTERN.sub(_gap_text, text)
+    except TypeError as e:
+        print(e, text)
+
+
+def gap_clean_series(transcripts: pd.Series) -> pd.Series:
+    """Clean a column of transcripts with gap_clean
+
+    :param transcripts: pandas series of transcripts
+    :return: pandas series of the cleaned texts, missing values stay missing
+    """
+    return transcripts.map(gap_clean, na_action="ignore")
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+
+
+def file_sha256(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 hash of the content of a file
+
+    :param file_path: path of the file
+    :param chunk_size: number of bytes read at once
+    :return: hex digest of the hash
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ParseManifest(object):
+    """Manifest of parsed TEI files to only parse new or changed files
+
+    For every parsed file (keyed by its path) the hash of its content and the clear_only setting of the parse are
+    stored. Modification time and size are stored too, so unchanged files are recognized without hashing them again.
+    """
+
+    def __init__(self, manifest_file: str, clear_only: bool):
+        """
+        :param manifest_file: path of the JSON manifest file, created on save if it does not exist
+        :param clear_only: clear_only setting of the current parse, files parsed with another setting are parsed again
+        """
+        self._manifest_file = manifest_file
+        self._clear_only = clear_only
+        # path -> current stat and hash of the files checked, stored on update
+        self._checked = {}
+        self._files = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                self._files = json.load(f)
+
+    @property
+    def files(self) -> list[str]:
+        """Property returning the paths of all parsed files of the manifest
+
+        :return: list of file paths
+        """
+        return list(self._files.keys())
+
+    def _is_changed(self, file_path: str) -> bool:
+        """Check if a file is new or changed since its last parse (or was parsed with another clear_only setting)
+
+        :param file_path: path of the TEI file
+        :return: True if the file has to be parsed
+        """
+        stat = os.stat(file_path)
+        entry = self._files.get(file_path)
+        checked = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        if (
+            entry is not None
+            and entry["clear_only"] == self._clear_only
+            and entry["mtime_ns"] == checked["mtime_ns"]
+            and entry["size"] == checked["size"]
+        ):
+            return False
+
+        checked["sha256"] = file_sha256(file_path)
+        self._checked[file_path] = checked
+        return (
+            entry is None
+            or entry["clear_only"] != self._clear_only
+            or entry["sha256"] != checked["sha256"]
+        )
+
+    def get_changed_files(self, file_paths: list) -> list:
+        """Get the files which have to be parsed, because they are new or changed
+
+        :param file_paths: paths of all TEI files of the corpus
+        :return: list of the file paths to parse
+        """
+        return [
+            file_path for file_path in file_paths if self._is_changed(str(file_path))
+        ]
+
+    def get_removed_files(self, file_paths: list) -> list[str]:
+        """Get the parsed files which are not part of the corpus anymore
+
+        :param file_paths: paths of all TEI files of the corpus
+        :return: list of the file paths
+        """
+        current = {str(file_path) for file_path in file_paths}
+        return [file_path for file_path in self._files if file_path not in current]
+
+    def update(self, file_path: str):
+        """Record a file as parsed
+
+        :param file_path: path of the TEI file
+        """
+        file_path = str(file_path)
+        checked = self._checked.pop(file_path, None)
+        if checked is None:
+            stat = os.stat(file_path)
+            checked = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": file_sha256(file_path),
+            }
+        self._files[file_path] = dict(checked, clear_only=self._clear_only)
+
+    def remove(self, file_path: str):
+        """Remove a file from the manifest
+
+        :param file_path: path of the TEI file
+        """
+        self._files.pop(str(file_path), None)
+
+    def save(self):
+        """Write the manifest file, recording the stat of files touched but unchanged too"""
+        for file_path, checked in self._checked.items():
+            entry = self._files.get(file_path)
+            if entry is not None and entry["sha256"] == checked["sha256"]:
+                entry.update(checked)
+        self._checked = {}
+        os.makedirs(os.path.dirname(self._manifest_file) or ".", exist_ok=True)
+        with open(self._manifest_file, "w", encoding="utf-8") as f:
+            json.dump(self._files, f, indent=4)
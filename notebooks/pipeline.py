@@ -0,0 +1,560 @@
+import argparse
+import concurrent.futures
+import glob
+import graphlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import date, datetime, timezone
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+from tqdm import tqdm
+
+from corpus import DATA_DIR, load_table, write_table
+from download_cache import DownloadCache
+from parse_manifest import file_sha256
+from utils import (
+    clean_dbpedia_manuscripts,
+    create_session,
+    download_ntvmr_documents,
+    download_ntvmr_manuscripts,
+    download_ntvmr_transcripts,
+    fetch_and_extract_zip,
+    fetch_and_format_xml,
+    get_docID_set,
+    get_json_manuscripts,
+    get_name_tables,
+    get_theo_occurrences,
+    get_words_table,
+    merge_manuscripts,
+    parse_tei_files,
+    prepare_verses,
+    query_dbpedia_manuscripts,
+    read_manuscripts,
+    read_tei_manuscripts,
+    read_parsed_verses,
+    search_occurrences,
+    write_verses,
+)
+
+IGNTP_URLS = [
+    "http://www.iohannes.com/transcriptions/XML/greek/papyri.zip",
+    "http://www.iohannes.com/transcriptions/XML/greek/majuscules.zip",
+    "http://www.iohannes.com/transcriptions/XML/greek/minuscules.zip",
+    "http://www.iohannes.com/transcriptions/XML/greek/lectionaries.zip",
+    "https://itseeweb.cal.bham.ac.uk/epistulae/downloads/Romans_Greek_transcriptions.zip",
+    "https://itseeweb.cal.bham.ac.uk/epistulae/downloads/Galatians_Greek_transcriptions.zip",
+    "https://itseeweb.cal.bham.ac.uk/epistulae/downloads/Ephesians_Greek_transcriptions.zip",
+    "https://itseeweb.cal.bham.ac.uk/epistulae/downloads/Philippians_Greek_transcriptions.zip",
+    "https://itseeweb.cal.bham.ac.uk/epistulae/downloads/1Cor_Greek_transcriptions.zip",
+]
+NTVMR_LIST_URL = "https://ntvmr.uni-muenster.de/community/vmr/api/metadata/liste/get/"
+# file of the input hashes of the last successful run of every stage, relative to the data directory
+PIPELINE_MANIFEST = "pipeline_manifest.json"
+
+
+def download(data_dir: str = DATA_DIR, max_workers: int = 16, rate_limit: float = 20):
+    """Stage of 01_download: download the TEI files of the IGNTP and NTVMR and the manuscript metadata of the NTVMR
+
+    Only new or changed files are extracted and downloaded (see DownloadCache).
+
+    :param data_dir: data directory
+    :param max_workers: number of concurrent downloads from the NTVMR
+    :param rate_limit: maximum number of requests per second to the NTVMR
+    """
+    with create_session(1) as session:
+        for url in IGNTP_URLS:
+            extracted = fetch_and_extract_zip(
+                url, f"{data_dir}/transcriptions/igntp", session
+            )
+            print(f"{url}: {extracted} files extracted")
+        fetch_and_format_xml(
+            NTVMR_LIST_URL,
+            f"{data_dir}/manuscripts/metadata_list.xml",
+            f"{data_dir}/manuscripts/metadata_list_errors.log",
+            session,
+        )
+
+    # basetext files are not needed
+    for file_path in glob.glob(
+        f"{data_dir}/transcriptions/**/*basetext*.xml", recursive=True
+    ):
+        os.remove(file_path)
+
+    docIDs = get_docID_set(f"{data_dir}/manuscripts/metadata_list.xml", all=False)
+    for out_dir, error_log_file, download_document in [
+        ("manuscripts", "errors.log", download_ntvmr_manuscripts),
+        ("transcriptions", "error.log", download_ntvmr_transcripts),
+    ]:
+        cache = DownloadCache(f"{data_dir}/{out_dir}/ntvmr_manifest.json")
+        for _ in tqdm(
+            download_ntvmr_documents(
+                docIDs,
+                f"{data_dir}/{out_dir}/ntvmr",
+                f"{data_dir}/{out_dir}/{error_log_file}",
+                download_document,
+                max_workers=max_workers,
+                cache=cache,
+                retries=3,
+                rate_limit=rate_limit,
+            ),
+            total=len(docIDs),
+            desc=out_dir,
+        ):
+            pass
+        print(f"{out_dir}: {len(cache.changed)} files changed")
+
+
+def get_words(data_dir: str = DATA_DIR):
+    """Stage of 02_get_words: merge the names and nominals (if listed) with all their normalized forms into the words table
+
+    :param data_dir: data directory
+    """
+    merged_df = get_words_table(
+        f"{data_dir}/tables/names.csv", f"{data_dir}/tables/nominals.csv"
+    )
+    merged_df.to_csv(f"{data_dir}/words.csv", index=False)
+    write_table(merged_df, "words", data_dir)
+
+
+def teiparse(
+    data_dir: str = DATA_DIR, clear_only: bool = True, max_workers: int = None
+):
+    """Stage of 03_1_teiparse: parse the new or changed TEI files into the verses table
+
+    :param data_dir: data directory
+    :param clear_only: set True to get GAP indicators for supplied and illegible text
+    :param max_workers: number of parsing processes (defaults to the number of processors)
+    """
+    parsed_dir = f"{data_dir}/parsed"
+    raw_files = sorted(Path(f"{data_dir}/transcriptions").rglob("*.xml"))
+    parse_tei_files(
+        raw_files,
+        parsed_dir,
+        clear_only=clear_only,
+        max_workers=max_workers,
+        progress=partial(tqdm, desc="parse"),
+    )
+
+    verses_df = prepare_verses(read_parsed_verses(f"{parsed_dir}/verses"))
+    write_verses(verses_df, data_dir)
+
+
+def teiheaders(data_dir: str = DATA_DIR, max_workers: int = None):
+    """Stage of 03_1_teiparse (section 3.4): read the manuscripts (TEI) table of the teiHeaders of the TEI files only
+
+    Refreshing the manuscripts (like 'python pipeline.py sparql') never parses the verses this way.
+
+    :param data_dir: data directory
+    :param max_workers: number of reading processes (defaults to the number of processors)
+    """
+    raw_files = sorted(Path(f"{data_dir}/transcriptions").rglob("*.xml"))
+    manuscripts_df = read_tei_manuscripts(
+        raw_files, max_workers=max_workers, progress=partial(tqdm, desc="teiheaders")
+    )
+    manuscripts_df.to_csv(
+        f"{data_dir}/manuscripts_tei.csv", index=False, index_label="index"
+    )
+
+
+def jsonparse(data_dir: str = DATA_DIR, max_workers: int = None):
+    """Stage of 03_2_jsonparse: parse the NTVMR JSON files into the manuscripts (JSON) table
+
+    :param data_dir: data directory
+    :param max_workers: number of parsing processes (defaults to the number of processors)
+    """
+    json_files = sorted(glob.glob(f"{data_dir}/manuscripts/ntvmr/*.json"))
+    manuscripts_json_df = get_json_manuscripts(
+        json_files, max_workers=max_workers, progress=partial(tqdm, desc="jsonparse")
+    )
+    manuscripts_json_df.to_csv(f"{data_dir}/manuscripts_json.csv", index=False)
+
+
+def sparql(data_dir: str = DATA_DIR):
+    """Stage of 03_3_sparql: merge the manuscripts of the TEI and JSON files and enrich them with data from DBpedia
+
+    :param data_dir: data directory
+    """
+    manuscripts_df = pd.concat(
+        [
+            read_manuscripts(f"{data_dir}/manuscripts_json.csv"),
+            read_manuscripts(
+                f"{data_dir}/manuscripts_tei.csv",
+                columns=["docID", "ga", "label", "source"],
+            ),
+        ],
+        ignore_index=True,
+    )
+    manuscripts_df.to_csv(f"{data_dir}/manuscripts_json_tei.csv", index=False)
+
+    dbpedia_df = clean_dbpedia_manuscripts(query_dbpedia_manuscripts())
+    merged_df = merge_manuscripts(manuscripts_df, dbpedia_df)
+    merged_df.to_csv(f"{data_dir}/manuscripts.csv", index=False)
+    write_table(merged_df, "manuscripts", data_dir)
+
+
+def search(data_dir: str = DATA_DIR, engine: str = "token", max_workers: int = None):
+    """Stage of 04_search: search the verses for occurrences of the words
+
+    :param data_dir: data directory
+    :param engine: search engine (see get_occurrences)
+    :param max_workers: number of search processes (defaults to the number of processors)
+    """
+    verses_df = load_table(
+        "verses",
+        columns=[
+            "ga",
+            "bkv",
+            "transcript",
+            "text",
+            "lection",
+            "publisher",
+            "source",
+            "edition_version",
+            "verse_id",
+        ],
+        data_dir=data_dir,
+    )
+    words_df = load_table(
+        "words",
+        columns=[
+            "label:en",
+            "label:el:norm",
+            "gender",
+            "variant",
+            "wordID",
+            "variantID",
+        ],
+        data_dir=data_dir,
+    )
+    with tqdm(total=verses_df["bkv"].nunique(), desc="search") as progress_bar:
+        for processed_bkvs in search_occurrences(
+            verses_df,
+            words_df,
+            f"{data_dir}/occurrences.parquet",
+            engine=engine,
+            max_workers=max_workers,
+        ):
+            progress_bar.update(len(processed_bkvs))
+
+
+def pub_prep(data_dir: str = DATA_DIR):
+    """Stage of 05_pub_prep: write the published files to the output directory
+
+    The JSON descriptions of the published files are generated by the notebook.
+
+    :param data_dir: data directory
+    """
+    out_dir = f"{data_dir}/out"
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ["manuscripts", "verses", "words"]:
+        shutil.copyfile(f"{data_dir}/{name}.csv", f"{out_dir}/{name}.csv")
+    verses_df = pd.read_csv(f"{out_dir}/verses.csv", low_memory=False)
+    words_df = pd.read_csv(f"{out_dir}/words.csv", low_memory=False)
+    occurrences_df = pd.read_parquet(
+        f"{data_dir}/occurrences.parquet",
+        columns=["verse_id", "variantID", "occurrence", "wordID"],
+    )
+    occurrences_df.to_csv(f"{out_dir}/occurrences.csv", index=False)
+
+    names_words_df, names_occurrences_df = get_name_tables(words_df, occurrences_df)
+    names_words_df.to_csv(f"{out_dir}/names.csv", index=False)
+    names_occurrences_df.to_csv(f"{out_dir}/name_occurrences.csv", index=False)
+
+    theo_occurrences = get_theo_occurrences(occurrences_df, words_df, verses_df)
+    theo_occurrences.to_csv(
+        f"{out_dir}/theo_occurrences_{date.today()}.csv", index=False
+    )
+
+
+# stages of the corpus build with their function and their inputs and outputs (paths or glob patterns relative to the
+# data directory). A stage depends on the stages writing its inputs, stages without inputs (the download) only run
+# if their outputs are missing or when forced.
+STAGES = {
+    "download": {
+        "func": download,
+        "inputs": [],
+        "outputs": ["transcriptions", "manuscripts"],
+    },
+    "get_words": {
+        "func": get_words,
+        # the list of nominals is optional (not shipped with the repository), it is read if it exists
+        "inputs": ["tables/names.csv", "tables/nominals.csv"],
+        "outputs": ["words.csv", "words.parquet"],
+    },
+    "teiparse": {
+        "func": teiparse,
+        "inputs": ["transcriptions/**/*.xml"],
+        "outputs": ["verses.csv", "verses.parquet"],
+    },
+    "teiheaders": {
+        "func": teiheaders,
+        "inputs": ["transcriptions/**/*.xml"],
+        "outputs": ["manuscripts_tei.csv"],
+    },
+    "jsonparse": {
+        "func": jsonparse,
+        "inputs": ["manuscripts/ntvmr/*.json"],
+        "outputs": ["manuscripts_json.csv"],
+    },
+    "sparql": {
+        "func": sparql,
+        "inputs": ["manuscripts_json.csv", "manuscripts_tei.csv"],
+        "outputs": [
+            "manuscripts_json_tei.csv",
+            "manuscripts.csv",
+            "manuscripts.parquet",
+        ],
+    },
+    "search": {
+        "func": search,
+        "inputs": ["verses.parquet", "words.parquet"],
+        "outputs": ["occurrences.parquet"],
+    },
+    "pub_prep": {
+        "func": pub_prep,
+        "inputs": ["manuscripts.csv", "verses.csv", "words.csv", "occurrences.parquet"],
+        "outputs": ["out"],
+    },
+}
+
+
+def _base_path(pattern: str) -> Path:
+    """Get the path of a glob pattern up to its first component with wildcards
+
+    :param pattern: path or glob pattern
+    :return: path
+    """
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts)
+
+
+def get_dependencies(stages: dict = None) -> dict:
+    """Get the stages every stage depends on, which are the stages writing its inputs
+
+    :param stages: dictionary of the stages (see STAGES)
+    :return: dictionary of stage name and set of the names of the stages it depends on
+    """
+    stages = STAGES if stages is None else stages
+    dependencies = {}
+    for name, stage in stages.items():
+        inputs = [_base_path(pattern) for pattern in stage["inputs"]]
+        dependencies[name] = {
+            other
+            for other, other_stage in stages.items()
+            if other != name
+            and any(
+                path == Path(output) or Path(output) in path.parents
+                for path in inputs
+                for output in other_stage["outputs"]
+            )
+        }
+    return dependencies
+
+
+def get_input_hashes(patterns: list, data_dir: str, previous: dict = None) -> dict:
+    """Hash the content of all input files of a stage
+
+    Files with the same modification time and size as in the previous run keep their hash without reading them.
+
+    :param patterns: paths or glob patterns of the inputs relative to the data directory, directories are read fully
+    :param data_dir: data directory
+    :param previous: input hashes of the previous run (as returned by this function)
+    :return: dictionary of file path (relative to data_dir) and its modification time, size and hash
+    """
+    previous = previous or {}
+    hashes = {}
+    for pattern in patterns:
+        full_pattern = os.path.join(data_dir, pattern)
+        if os.path.isdir(full_pattern):
+            full_pattern = os.path.join(full_pattern, "**", "*")
+        for file_path in glob.glob(full_pattern, recursive=True):
+            if not os.path.isfile(file_path):
+                continue
+            stat = os.stat(file_path)
+            key = os.path.relpath(file_path, data_dir)
+            entry = previous.get(key)
+            if (
+                entry is None
+                or entry["mtime_ns"] != stat.st_mtime_ns
+                or entry["size"] != stat.st_size
+            ):
+                entry = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "sha256": file_sha256(file_path),
+                }
+            hashes[key] = entry
+    return hashes
+
+
+def _run_stage(
+    name: str, stage: dict, data_dir: str, force: bool, previous: dict
+) -> (str, dict or None):
+    """Run a stage, unless its outputs exist and its inputs are unchanged since its last run
+
+    :param name: name of the stage
+    :param stage: stage (see STAGES)
+    :param data_dir: data directory
+    :param force: set True to run the stage anyway
+    :param previous: manifest entry of the last run of the stage
+    :return: tuple of status ("done" or "skipped") and the input hashes of the run (None if skipped)
+    """
+    hashes = get_input_hashes(stage["inputs"], data_dir, previous.get("inputs"))
+    outputs_exist = all(
+        os.path.exists(os.path.join(data_dir, output)) for output in stage["outputs"]
+    )
+    unchanged = "inputs" in previous and {
+        key: entry["sha256"] for key, entry in hashes.items()
+    } == {key: entry["sha256"] for key, entry in previous["inputs"].items()}
+    if not force and outputs_exist and unchanged:
+        print(f"{name}: skipped, inputs unchanged")
+        return "skipped", None
+
+    print(f"{name}: started")
+    start_time = time.time()
+    stage["func"](data_dir)
+    print(f"{name}: done in {time.time() - start_time:.1f} seconds")
+    return "done", hashes
+
+
+def run_pipeline(
+    targets: list = None,
+    data_dir: str = DATA_DIR,
+    force: bool = False,
+    max_workers: int = 2,
+    stages: dict = None,
+) -> dict:
+    """Run stages of the pipeline with all stages they depend on, independent stages run concurrently
+
+    Stages whose outputs exist and whose inputs did not change since their last successful run are skipped, stages
+    depending on a failed stage are blocked. The input hashes of every successful run are stored in PIPELINE_MANIFEST.
+
+    :param targets: names of the stages to run, all stages if None
+    :param data_dir: data directory
+    :param force: set True to run the targets and the stages they depend on, even if their inputs are unchanged
+    :param max_workers: maximum number of stages running at once
+    :param stages: dictionary of the stages (see STAGES)
+    :return: dictionary of stage name and its status ("done", "skipped", "failed" or "blocked")
+    """
+    stages = STAGES if stages is None else stages
+    dependencies = get_dependencies(stages)
+    unknown = set(targets or []) - set(stages)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    # the targets with all stages they depend on
+    selected = set()
+    pending = list(targets or stages)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(dependencies[name])
+    sorter = graphlib.TopologicalSorter({name: dependencies[name] for name in selected})
+    sorter.prepare()
+
+    manifest_file = os.path.join(data_dir, PIPELINE_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    status = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                if any(
+                    status[dep] in ("failed", "blocked") for dep in dependencies[name]
+                ):
+                    print(f"{name}: blocked by a failed stage")
+                    status[name] = "blocked"
+                    sorter.done(name)
+                    continue
+                future = executor.submit(
+                    _run_stage,
+                    name,
+                    stages[name],
+                    data_dir,
+                    force,
+                    manifest.get(name, {}),
+                )
+                futures[future] = name
+            if not futures:
+                continue
+
+            done, _ = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    status[name], hashes = future.result()
+                except Exception as e:
+                    print(f"{name}: failed, {type(e).__name__}: {e}")
+                    status[name] = "failed"
+                    hashes = None
+                if hashes is not None:
+                    manifest[name] = {
+                        "inputs": hashes,
+                        "finished": datetime.now(timezone.utc).isoformat(),
+                    }
+                    os.makedirs(data_dir, exist_ok=True)
+                    with open(manifest_file, "w", encoding="utf-8") as f:
+                        json.dump(manifest, f, indent=4)
+                sorter.done(name)
+    return status
+
+
+def main(argv: list = None) -> int:
+    """Command line interface of the pipeline, run 'python pipeline.py --help' from the notebooks directory
+
+    :param argv: command line arguments, sys.argv if None
+    :return: exit code, 1 if a stage failed
+    """
+    parser = argparse.ArgumentParser(
+        description="Build the corpus by running the stages of the notebooks headless"
+    )
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        help=f"stages to run (with the stages they depend on), all stages if none given: {', '.join(STAGES)}",
+    )
+    parser.add_argument("--data-dir", default=DATA_DIR, help="data directory")
+    parser.add_argument(
+        "--force", action="store_true", help="run the stages even if unchanged"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=2, help="maximum number of stages running at once"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="list the stages and their dependencies"
+    )
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, dependencies in get_dependencies().items():
+            print(f"{name}: {', '.join(sorted(dependencies)) or '-'}")
+        return 0
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    status = run_pipeline(args.stages or None, args.data_dir, args.force, args.jobs)
+    for name, stage_status in status.items():
+        print(f"{name:<10} {stage_status}")
+    return 1 if any(s in ("failed", "blocked") for s in status.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
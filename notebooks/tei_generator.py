@@ -0,0 +1,246 @@
+import random
+from pathlib import Path
+
+# polytonic words of the generated verses, the names are found by the word search (see NAMES)
+WORDS = [
+    "καὶ",
+    "ὁ",
+    "τὸν",
+    "αὐτῷ",
+    "εἶπεν",
+    "πρὸς",
+    "λόγος",
+    "ἦν",
+    "ἐν",
+    "ἀρχῇ",
+    "ἀπεκρίθη",
+    "καταβαίνοντας",
+    "μαθηταῖς",
+    "οὐρανοῦ",
+    "ἀμὴν",
+    "λέγω",
+    "ὑμῖν",
+    "ἐπὶ",
+    "γῆς",
+    "ἡμέρᾳ",
+]
+NAMES = {
+    "Jesus": ["Ἰησοῦς", "Ἰησοῦ", "Ἰησοῦν"],
+    "Peter": ["Πέτρος", "Πέτρου", "Πέτρον"],
+    "Mary": ["Μαρία", "Μαριάμ"],
+    "Paul": ["Παῦλος", "Παύλου"],
+}
+# nomina sacra as contracted in the manuscripts
+NOMINA_SACRA = ["θς", "θυ", "ις", "ιυ", "χς", "χυ", "κς", "κυ", "πνα"]
+# categories of manuscripts by the leading digit of their docID (see converters.CATEGORY_PREFIXES)
+PAPYRUS, MAJUSCULE, MINUSCULE, LECTIONARY = 1, 2, 3, 4
+TEI_HEADER = """<teiHeader>
+<fileDesc>
+<titleStmt><title type="document" n="{ga}">{name}</title></titleStmt>
+<editionStmt><edition n="1.{number}"><date>2024-01-01</date></edition></editionStmt>
+<publicationStmt><publisher><name>INTF</name></publisher><date>January 2, 2024</date></publicationStmt>
+<sourceDesc><msDesc><msIdentifier><msName>{name}</msName><altIdentifier type="Liste"><idno>{docID}</idno></altIdentifier></msIdentifier></msDesc></sourceDesc>
+</fileDesc>
+<encodingDesc n="2.3"/>
+<funder>DFG</funder>
+</teiHeader>"""
+
+
+def _word(rng: random.Random, rates: dict) -> str:
+    """Generate a w-tag, some of its letters unclear, supplied or broken by a line break, or a nomen sacrum
+
+    :param rng: random generator
+    :param rates: probabilities of the markup (see generate_tei)
+    :return: XML string of the word
+    """
+    if rng.random() < rates["nomsac"]:
+        return f'<w><abbr type="nomSac"><hi rend="overline">{rng.choice(NOMINA_SACRA)}</hi></abbr></w>'
+    word = rng.choice(NAMES[rng.choice(list(NAMES))] if rng.random() < 0.2 else WORDS)
+    cut = rng.randrange(1, len(word)) if len(word) > 1 else 1
+    head, tail = word[:cut], word[cut:]
+    if tail and rng.random() < rates["unclear"]:
+        tail = f'<unclear reason="damage to page">{tail}</unclear>'
+    elif tail and rng.random() < rates["supplied"]:
+        tail = f'<supplied reason="lacuna">{tail}</supplied>'
+    elif tail and rng.random() < rates["lb"]:
+        tail = f'<lb break="no" n="{rng.randrange(1, 30)}"/>{tail}'
+    return f"<w>{head}{tail}</w>"
+
+
+def _words(rng: random.Random, word_count: int, rates: dict) -> str:
+    """Generate the words of a verse (part) with gaps, notes and punctuation in between
+
+    :param rng: random generator
+    :param word_count: number of words
+    :param rates: probabilities of the markup (see generate_tei)
+    :return: XML string of the words
+    """
+    parts = []
+    for _ in range(word_count):
+        if rng.random() < rates["gap"]:
+            parts.append(
+                f'<gap reason="lacuna" unit="char" extent="{rng.randrange(1, 12)}"/>'
+            )
+        parts.append(_word(rng, rates))
+        if rng.random() < rates["note"]:
+            parts.append('<note type="local">Note</note>')
+    if rng.random() < 0.5:
+        parts.append("<pc>·</pc>")
+    return "".join(parts)
+
+
+def _verse(rng: random.Random, verse_id: str, state: dict, rates: dict) -> str:
+    """Generate the ab-tag(s) of a verse, split into an initial ('I') and a final ('F') part by a page break
+
+    :param rng: random generator
+    :param verse_id: verse identifier like "B04K1V51"
+    :param state: page counter of the document, updated at page breaks
+    :param rates: probabilities of the markup (see generate_tei)
+    :return: XML string of the verse
+    """
+    word_count = rng.randrange(4, 16)
+    if rng.random() >= rates["split"]:
+        return f'<ab n="{verse_id}">{_words(rng, word_count, rates)}</ab>\n'
+    state["page"] += 1
+    # the word broken by the page break continues as part 'F' of the final part
+    return (
+        f'<ab n="{verse_id}" part="I">{_words(rng, word_count // 2, rates)}<w>ἀπε</w></ab>\n'
+        f'<pb n="{state["page"]}r"/>\n'
+        f'<ab n="{verse_id}" part="F"><w part="F">κρίθη</w>{_words(rng, word_count - word_count // 2, rates)}</ab>\n'
+    )
+
+
+def verse_ids(verse_count: int, verses_per_chapter: int = 30) -> list[str]:
+    """Get consecutive verse identifiers from Matthew on, in the form of the NTVMR ("B01K1V1")
+
+    :param verse_count: number of verse identifiers
+    :param verses_per_chapter: number of verses of every chapter
+    :return: list of verse identifiers
+    """
+    chapters_per_book = 20
+    return [
+        f"B{idx // (verses_per_chapter * chapters_per_book) + 1:02d}"
+        f"K{idx // verses_per_chapter % chapters_per_book + 1}V{idx % verses_per_chapter + 1}"
+        for idx in range(verse_count)
+    ]
+
+
+def generate_tei(
+    verse_count: int,
+    category: int = LECTIONARY,
+    number: int = 1,
+    seed: int = 0,
+    lection_size: int = 12,
+    split: float = 0.05,
+    unclear: float = 0.05,
+    supplied: float = 0.05,
+    gap: float = 0.02,
+    nomsac: float = 0.05,
+    lb: float = 0.05,
+    note: float = 0.01,
+) -> str:
+    """Generate a TEI document shaped like the transcriptions of the IGNTP and the NTVMR. Lectionaries (category
+    LECTIONARY) group their verses into lections, repeating verses of earlier lections, all other manuscripts into books
+    and chapters. The rates are the probabilities of a verse being split or of a word getting the markup.
+
+    :param verse_count: number of verses (ab-tags, a split verse counts once) of the document
+    :param category: category of the manuscript (PAPYRUS, MAJUSCULE, MINUSCULE or LECTIONARY)
+    :param number: number of the manuscript in its category, giving its GA number and docID
+    :param seed: seed of the random generator, the same arguments always generate the same document
+    :param lection_size: average number of verses of a lection
+    :param split: rate of verses split into an initial and a final part by a page break
+    :param unclear: rate of words with unclear letters
+    :param supplied: rate of words with supplied letters
+    :param gap: rate of gaps in front of a word
+    :param nomsac: rate of words being nomina sacra
+    :param lb: rate of words broken by a line break
+    :param note: rate of notes after a word
+    :return: XML string of the document
+    """
+    rng = random.Random(seed)
+    rates = {
+        "split": split,
+        "unclear": unclear,
+        "supplied": supplied,
+        "gap": gap,
+        "nomsac": nomsac,
+        "lb": lb,
+        "note": note,
+    }
+    ga = f"{['P', '0', '', 'L'][category - 1]}{number}"
+    header = TEI_HEADER.format(
+        ga=ga, name=f"Manuscript {ga}", number=number, docID=category * 10000 + number
+    )
+    state = {"page": 1}
+    body = []
+    if category == LECTIONARY:
+        # lections read a few consecutive verses, starting anywhere in the text
+        ids = verse_ids(max(verse_count // 2, lection_size))
+        lection = 0
+        while verse_count > 0:
+            lection += 1
+            size = min(rng.randrange(1, 2 * lection_size), verse_count)
+            start = rng.randrange(len(ids))
+            verses = [
+                _verse(rng, ids[(start + idx) % len(ids)], state, rates)
+                for idx in range(size)
+            ]
+            # the title of the lection is written into its first verse
+            verses[0] = verses[0].replace(
+                ">", '><fw type="lectTitle"><w>ευαγγελιον</w></fw>', 1
+            )
+            body.append(f'<div type="lection" n="Lect {lection}">\n')
+            body.extend(verses)
+            body.append("</div>\n")
+            verse_count -= size
+    else:
+        chapter_id = None
+        for verse_id in verse_ids(verse_count):
+            book_id, _ = verse_id.split("K")
+            if verse_id.split("V")[0] != chapter_id:
+                if chapter_id is not None:
+                    body.append("</div></div>\n")
+                chapter_id = verse_id.split("V")[0]
+                body.append(
+                    f'<div type="book" n="{book_id}"><div type="chapter" n="{chapter_id}">\n'
+                )
+            body.append(_verse(rng, verse_id, state, rates))
+        if chapter_id is not None:
+            body.append("</div></div>\n")
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        f'<TEI xmlns="http://www.tei-c.org/ns/1.0">\n{header}\n'
+        f'<text><body>\n<pb n="1r"/>\n{"".join(body)}</body></text>\n</TEI>\n'
+    )
+
+
+def write_tei_corpus(
+    out_dir: str,
+    file_count: int,
+    verse_count: int,
+    lectionary_share: float = 0.5,
+    seed: int = 0,
+    **rates,
+) -> list[Path]:
+    """Write a corpus of generated TEI documents named by their docIDs like the downloaded transcriptions
+
+    :param out_dir: directory to write the documents to
+    :param file_count: number of documents
+    :param verse_count: number of verses of every document
+    :param lectionary_share: share of lectionaries, all other documents are minuscules
+    :param seed: seed of the corpus, every document gets its own seed derived of it
+    :param rates: rates of the markup passed to generate_tei
+    :return: list of the paths of the written documents
+    """
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+    file_paths = []
+    for number in range(1, file_count + 1):
+        category = LECTIONARY if number <= file_count * lectionary_share else MINUSCULE
+        file_path = out_path / f"{category * 10000 + number}.xml"
+        file_path.write_text(
+            generate_tei(verse_count, category, number, seed + number, **rates),
+            encoding="utf-8",
+        )
+        file_paths.append(file_path)
+    return file_paths
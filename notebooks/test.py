@@ -1,15 +1,154 @@
 import pytest
 from bs4 import BeautifulSoup
 from TEIFile import TEIFile
+from TEIStreamFile import TEIStreamFile
 from utils import (
     generate_transcription_url,
     format_xml,
     bkv_nkv_from_verse_id,
+    bkv_nkv_from_verse_ids,
+    fix_bkv,
+    fix_bkvs,
+    ga_to_docID,
     gap_clean,
+    gap_clean_series,
+    get_data_from_tei,
+    search_words,
+    process_bkv,
+    iter_bkv_batches,
+    get_occurrences,
+    get_variant_word_lookup,
+    search_occurrences,
+    download_ntvmr_documents,
+    download_ntvmr_transcripts,
+    download_ntvmr_manuscripts,
+    get_failed_docIDs,
+    fetch_and_extract_zip,
+    url_to_error_log,
+    remove_parsed_files,
+    update_partitions,
+    read_partitions,
+    PARSED_VERSES_DTYPES,
+    read_parsed_verses,
+    prepare_verses,
+    write_verses,
+    get_words_table,
+    read_tei_manuscripts,
+    parse_tei_files,
 )
+from parse_manifest import ParseManifest
+from pipeline import get_dependencies, run_pipeline, teiheaders, teiparse
+from error_log import ErrorLog, read_error_log
+from download_cache import DownloadCache
+from http_adapter import RateLimiter, RetryAdapter
+from corpus import TABLES, load_table, write_table
+from converters import (
+    bkv_to_nkv,
+    bkvs_to_nkvs,
+    docID_to_ga,
+    docIDs_to_gas,
+    forms_to_gas,
+    gas_to_docIDs,
+)
+from verse_codec import (
+    bkv_to_key,
+    decode_bkvs,
+    decode_nkvs,
+    encode_bkvs,
+    encode_nkvs,
+    nkv_to_key,
+    pack,
+    unpack,
+)
+from matchers import AhoCorasick, TokenMatcher, VariantMatcher
+from tei_generator import generate_tei, write_tei_corpus
+from normalization import (
+    normalize,
+    normalize_series,
+    remove_diacritics,
+    remove_diacritics_nfkd,
+)
+import hashlib
+import concurrent.futures
+import json
+import multiprocessing
 import pandas as pd
+import os
+import threading
+import time
+import zipfile
+import utils
 import xml.etree.ElementTree as ET
 import re
+from io import BytesIO
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TEI_SAMPLE = """<?xml version="1.0" encoding="utf-8"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+<teiHeader>
+<fileDesc>
+<titleStmt><title type="document" n="L329">Lectionary 329</title></titleStmt>
+<editionStmt><edition n="1.2"><date>2021-03-04</date></edition></editionStmt>
+<publicationStmt><publisher><name>INTF</name></publisher><date>March 5, 2021</date></publicationStmt>
+<sourceDesc><msDesc><msIdentifier><msName>Lect. 329</msName><altIdentifier type="Liste"><idno>40329</idno></altIdentifier></msIdentifier></msDesc></sourceDesc>
+</fileDesc>
+<encodingDesc n="2.3"/>
+<funder>DFG</funder>
+</teiHeader>
+<text><body>
+<div type="lection" n="Lect 1">
+<ab n="B04K1V51"><fw type="lectTitle"><w>ευαγγελιον</w></fw><gap reason="lacuna" unit="verse" extent="rest"/><w><abbr type="nomSac"><hi rend="overline">θυ</hi></abbr></w> <w>καὶ</w><w>κα<lb break="no" n="3"/>ταβαίνοντας</w><w>μα<abbr type="nomSac"><supplied reason="unspecified"><hi rend="overline">ις</hi></supplied></abbr></w><note type="local">Note</note><pc>·</pc></ab>
+<ab n="B04K1V52" part="I"><w>Ἰησοῦς</w><w>ἀπε</w></ab>
+<pb n="2r"/>
+<ab n="B04K1V52" part="F"><w part="F">κρίθη</w><w>αὐτ<unclear reason="damage to page">ῷ</unclear></w></ab>
+</div>
+<div type="lection" n="Lect 2">
+<ab n="B04K1V51"><w>πάλιν</w><gap reason="witnessEnd"/></ab>
+</div>
+<div type="book" n="B06"><div type="chapter" n="B06K1">
+<ab n="Rom.1.1"><w>παῦλος</w> <w><unclear>χυ</unclear></w></ab>
+</div></div>
+</body></text>
+</TEI>
+"""
+
+
+@pytest.fixture
+def words_df():
+    return pd.DataFrame(
+        {
+            "variant": ["ιησους", "ιησου", "πετρος", "πετρου", "μαρια", "μαριαμ"],
+            "wordID": [0, 0, 1, 1, 2, 2],
+            "variantID": [0, 1, 2, 3, 4, 5],
+        }
+    )
+
+
+@pytest.fixture
+def verses_df():
+    return pd.DataFrame(
+        {
+            "verse_id": [1, 2, 3, 4],
+            "bkv": ["B04K1V42", "B04K1V42", "B04K1V42", "B04K1V42"],
+            "transcript": ["", "", "", ""],
+            "text": [
+                "ηγαγεν αυτον προς τον ιησουν εμβλεψας δε αυτω ο ιησους ειπεν",
+                "ηγαγεν αυτον προς ιησου ο δε πετρος",
+                "μαριαμ και μαρια_ πετρουσ",
+                "ουδεν",
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def tei_sample_file(tmp_path):
+    file_path = tmp_path / "ntvmr" / "40329.xml"
+    file_path.parent.mkdir()
+    file_path.write_text(TEI_SAMPLE, encoding="utf-8")
+    return file_path
 
 
 @pytest.mark.parametrize(
@@ -54,9 +193,9 @@ def test_generate_transcription_url(input_value, expected_output):
         ("<gap reason='witnessEnd'/>", "[GAP-witnessEnd]"),
     ],
 )
-def test_handle_gap(input_value, expected_output):
+def test_handle_gap(tei_sample_file, input_value, expected_output):
     # start instance of Class, parameter without any meaning
-    obj = TEIFile("../data/transcriptions/test/lectionary.xml", True, True)
+    obj = TEIFile(tei_sample_file, True, True)
     # read test input xml
     soup = BeautifulSoup(input_value, "xml")
     # get gap tag
@@ -90,9 +229,9 @@ def test_handle_gap(input_value, expected_output):
         ),
     ],
 )
-def test_extract_word_clearonly(input_value, expected_output):
+def test_extract_word_clearonly(tei_sample_file, input_value, expected_output):
     # start instance of Class, parameter without any meaning
-    obj = TEIFile("../data/transcriptions/test/lectionary.xml", True, True)
+    obj = TEIFile(tei_sample_file, True, True)
     # read test input xml
     soup = BeautifulSoup(input_value, "xml")
     # get gap tag
@@ -126,9 +265,9 @@ def test_extract_word_clearonly(input_value, expected_output):
         ),
     ],
 )
-def test_extract_word_all(input_value, expected_output):
+def test_extract_word_all(tei_sample_file, input_value, expected_output):
     # start instance of Class, parameter without any meaning
-    obj = TEIFile("../data/transcriptions/test/lectionary.xml", False, True)
+    obj = TEIFile(tei_sample_file, False, True)
     # read test input xml
     soup = BeautifulSoup(input_value, "xml")
     # get gap tag
@@ -154,9 +293,11 @@ def test_extract_word_all(input_value, expected_output):
         ),
     ],
 )
-def test_get_verse_transcription_clearOnly(input_value, expected_output):
+def test_get_verse_transcription_clearOnly(
+    tei_sample_file, input_value, expected_output
+):
     # start instance of Class, parameter without any meaning
-    obj = TEIFile("../data/transcriptions/test/lectionary.xml", True, True)
+    obj = TEIFile(tei_sample_file, True, True)
     # read test input xml
     soup = BeautifulSoup(input_value, "xml")
     # get gap tag
@@ -182,9 +323,9 @@ def test_get_verse_transcription_clearOnly(input_value, expected_output):
         ),
     ],
 )
-def test_get_verse_transcription_all(input_value, expected_output):
+def test_get_verse_transcription_all(tei_sample_file, input_value, expected_output):
     # start instance of Class, parameter without any meaning
-    obj = TEIFile("../data/transcriptions/test/lectionary.xml", False, True)
+    obj = TEIFile(tei_sample_file, False, True)
     # read test input xml
     soup = BeautifulSoup(input_value, "xml")
     # get gap tag
@@ -206,9 +347,9 @@ def test_get_verse_transcription_all(input_value, expected_output):
         ),
     ],
 )
-def test_str_remove_diacritics(input_value, expected_output):
+def test_str_remove_diacritics(tei_sample_file, input_value, expected_output):
     # start instance of Class, parameter without any meaning
-    obj = TEIFile("../data/transcriptions/test/lectionary.xml", True, True)
+    obj = TEIFile(tei_sample_file, True, True)
     # function test
     assert obj._str_remove_diacritics(input_value).lower() == expected_output
 
@@ -326,3 +467,997 @@ def test_extract_greek_and_spaces(input_value, expected_output):
     s = "".join(re.findall(r"[Α-Ωα-ω\s]+", input_value))
     s = re.sub(r"\s+", " ", s).strip()
     assert s == expected_output
+
+
+def _sorted_rows(rows: list[dict]) -> list:
+    return sorted(sorted((k, str(v)) for k, v in row.items()) for row in rows)
+
+
+@pytest.mark.parametrize("clear_only", [True, False])
+def test_stream_engine_matches_soup(tei_sample_file, clear_only):
+    soup_rows = TEIFile(tei_sample_file, clear_only, False).get_transcription_list()
+    stream_rows = TEIStreamFile(
+        tei_sample_file, clear_only, False
+    ).get_transcription_list()
+    assert len(stream_rows) == 4
+    assert _sorted_rows(stream_rows) == _sorted_rows(soup_rows)
+
+
+def test_engine_orders(tei_sample_file, tmp_path):
+    def order(tei):
+        return [(row["lection"], row["verse"]) for row in tei.transcriptions]
+
+    # TEIFile groups the verses by verse id, TEIStreamFile keeps the document order
+    assert order(TEIFile(tei_sample_file, True, False)) == [
+        ("Lect 1", "B04K1V51"),
+        ("Lect 2", "B04K1V51"),
+        ("Lect 1", "B04K1V52"),
+        (None, "Rom.1.1"),
+    ]
+    assert order(TEIStreamFile(tei_sample_file, True, False)) == [
+        ("Lect 1", "B04K1V51"),
+        ("Lect 1", "B04K1V52"),
+        ("Lect 2", "B04K1V51"),
+        (None, "Rom.1.1"),
+    ]
+
+    # an initial part without final part is yielded at the end by TEIStreamFile
+    file_path = tmp_path / "initial.xml"
+    file_path.write_text(
+        TEI_SAMPLE.replace(
+            '<ab n="B04K1V51"><w>πάλιν', '<ab n="B04K1V53" part="I"><w>πάλιν'
+        ),
+        encoding="utf-8",
+    )
+    assert [verse for _, verse in order(TEIFile(file_path, True, False))] == [
+        "B04K1V51",
+        "B04K1V52",
+        "B04K1V53",
+        "Rom.1.1",
+    ]
+    assert [verse for _, verse in order(TEIStreamFile(file_path, True, False))] == [
+        "B04K1V51",
+        "B04K1V52",
+        "Rom.1.1",
+        "B04K1V53",
+    ]
+
+    # on a generated lectionary the orders differ, but not the dictionaries
+    file_path.write_text(generate_tei(400, split=0.2), encoding="utf-8")
+    soup_rows = TEIFile(file_path, True, False).get_transcription_list()
+    stream_rows = TEIStreamFile(file_path, True, False).get_transcription_list()
+    assert soup_rows != stream_rows
+    assert _sorted_rows(soup_rows) == _sorted_rows(stream_rows)
+    soup_verses = [row["verse"] for row in soup_rows]
+    # every verse id is one run of rows
+    runs = [
+        verse
+        for idx, verse in enumerate(soup_verses)
+        if idx == 0 or soup_verses[idx - 1] != verse
+    ]
+    assert len(runs) == len(set(runs))
+
+
+def test_transcriptions_in_document_order(tei_sample_file):
+    verses = [
+        row["verse"] for row in TEIFile(tei_sample_file, True, False).transcriptions
+    ]
+    assert verses == ["B04K1V51", "B04K1V51", "B04K1V52", "Rom.1.1"]
+
+
+def test_stream_engine_merges_parts(tei_sample_file):
+    rows = {
+        (row["lection"], row["verse"]): row["transcript"]
+        for row in TEIStreamFile(tei_sample_file, True, False).transcriptions
+    }
+    assert (
+        rows[("Lect 1", "B04K1V52")]
+        == "ιησους απεκριθη αυτ[gap-unclear-damagetopage-1-ω]"
+    )
+    assert rows[(None, "Rom.1.1")] == "παυλος [gap-unclear-2-χυ]"
+
+
+def test_parser_emits_text(tei_sample_file):
+    rows = TEIFile(tei_sample_file, True, False).transcriptions
+    assert [row["text"] for row in rows] == [
+        gap_clean(row["transcript"]) for row in rows
+    ]
+    assert rows[-1]["text"] == "παυλος χυ"
+    transcripts = pd.Series([row["transcript"] for row in rows] + [None])
+    assert gap_clean_series(transcripts).tolist() == [row["text"] for row in rows] + [
+        None
+    ]
+
+
+def test_stream_engine_manuscript_data(tei_sample_file):
+    assert TEIStreamFile(tei_sample_file, True, False).get_manuscript_data() == {
+        "ga": "L329",
+        "docID": "40329",
+        "label": "Lect. 329",
+        "source": "ntvmr",
+    }
+
+
+def test_header_lookups_memoized(tei_sample_file, monkeypatch):
+    calls = {"read": 0, "find": 0}
+    read_tei_header = TEIFile._read_tei_header
+
+    def counting_read(tei_file_path):
+        calls["read"] += 1
+        return read_tei_header(tei_file_path)
+
+    monkeypatch.setattr(TEIFile, "_read_tei_header", staticmethod(counting_read))
+    tei = TEIFile(tei_sample_file, True, False, header_only=True)
+    soup_find, soup_find_all = tei._soup.find, tei._soup.find_all
+
+    def counting(find):
+        def wrapper(*args, **kwargs):
+            calls["find"] += 1
+            return find(*args, **kwargs)
+
+        return wrapper
+
+    tei._soup.find, tei._soup.find_all = counting(soup_find), counting(soup_find_all)
+    first = (tei.header_data, tei.get_manuscript_data())
+    lookups = calls["find"]
+    assert lookups > 0
+    # repeated accesses reuse the memoized fields, the header is neither read nor searched again
+    for _ in range(3):
+        assert (tei.header_data, tei.get_manuscript_data()) == first
+    assert calls == {"read": 1, "find": lookups}
+
+
+def test_get_data_from_tei_header_only(tei_sample_file):
+    man_data, trans_data = get_data_from_tei(tei_sample_file, True, header_only=True)
+    assert trans_data is None
+    assert man_data == get_data_from_tei(tei_sample_file, True)[0]
+
+
+def test_header_only_stops_at_tei_header(tmp_path):
+    # the body is never parsed, so a broken body does not matter
+    file_path = tmp_path / "broken.xml"
+    file_path.write_text(TEI_SAMPLE.replace("</body>", "<ab></body>"), encoding="utf-8")
+    tei = TEIFile(file_path, True, False, header_only=True)
+    assert tei.ga == "L329"
+    assert tei.alt_identifiers == {"Liste": "40329"}
+    # the body is not read, so its well-formedness is unknown
+    assert tei.well_formed is None
+    assert TEIFile(file_path, True, False).well_formed is False
+    result = get_data_from_tei(
+        file_path, True, False, True, str(tmp_path), str(tmp_path), header_only=True
+    )
+    assert result["well_formed"] is None
+
+
+def test_read_tei_manuscripts(tmp_path, tei_sample_file):
+    broken_body = tmp_path / "40330.xml"
+    broken_body.write_text(
+        TEI_SAMPLE.replace("40329", "40330").replace("</body>", "<ab></body>"),
+        encoding="utf-8",
+    )
+    broken_header = tmp_path / "40331.xml"
+    broken_header.write_text(
+        TEI_SAMPLE.replace("</teiHeader>", "<teiHeader>"), encoding="utf-8"
+    )
+    manuscripts_df = read_tei_manuscripts(
+        [broken_header, broken_body, tei_sample_file], max_workers=1
+    )
+    # the manuscripts are read of the teiHeaders, so only a malformed teiHeader is skipped
+    assert sorted(manuscripts_df["docID"]) == ["40329", "40330"]
+    sample = manuscripts_df[manuscripts_df["docID"] == "40329"].iloc[0].to_dict()
+    assert sample == get_data_from_tei(tei_sample_file, True)[0]
+
+
+def test_aho_corasick_overlapping_matches():
+    automaton = AhoCorasick(["ιησου", "ιησους", "σου"])
+    matches = sorted(automaton.iter_matches("ιησους"))
+    assert matches == [(0, 5, 0), (0, 6, 1), (2, 5, 2)]
+
+
+def test_variant_matcher_word_boundaries(words_df):
+    matcher = VariantMatcher(words_df)
+    assert matcher.find("ο ιησους ειπεν") == {(0, 0)}
+    assert matcher.find("ιησουν μαριαμ") == {(5, 2)}
+    assert matcher.find("[GAP-lacuna]πετρου·") == {(3, 1)}
+
+
+@pytest.mark.parametrize("engine", ["aho-corasick", "token"])
+def test_search_words_engines(words_df, verses_df, engine):
+    expected = verses_df.copy()
+    search_words(words_df, expected)
+    search_words(words_df, verses_df, engine)
+    assert verses_df.equals(expected)
+    assert list(verses_df["found_variants"]) == [{0}, {1, 2}, {5}, set()]
+
+
+def test_token_matcher_phrase_fallback(words_df):
+    words = pd.concat(
+        [
+            words_df,
+            pd.DataFrame(
+                {"variant": ["σιμων πετρος"], "wordID": [1], "variantID": [6]}
+            ),
+        ]
+    )
+    matcher = TokenMatcher(words)
+    assert matcher.find("σιμων πετρος ειπεν") == {(2, 1), (6, 1)}
+    assert matcher.find("σιμων ο πετρος") == {(2, 1)}
+
+
+def test_iter_bkv_batches(verses_df):
+    verses_df.loc[3, "bkv"] = "B04K1V43"
+    batches = list(iter_bkv_batches(verses_df, batch_size=1))
+    assert [[bkv for bkv, _ in batch] for batch in batches] == [
+        ["B04K1V42"],
+        ["B04K1V43"],
+    ]
+    assert list(batches[0][0][1]["verse_id"]) == [1, 2, 3]
+
+
+def test_search_occurrences_matches_process_bkv(tmp_path, words_df, verses_df):
+    verses_df.loc[3, "bkv"] = "B04K1V43"
+    for bkv in verses_df["bkv"].unique():
+        process_bkv(bkv, str(tmp_path / "expected"), verses_df, words_df)
+    # the verse of B04K1V43 is the only one of its bkv, so its file has no occurrences
+    expected = pd.concat(
+        pd.read_csv(file_path).fillna({"variantID": -1})
+        for file_path in (tmp_path / "expected").glob("*.csv")
+        if file_path.stem != "B04K1V43"
+    )
+    assert pd.read_csv(tmp_path / "expected" / "B04K1V43.csv").empty
+
+    output_file = tmp_path / "occurrences.parquet"
+    processed = [
+        bkv
+        for batch in search_occurrences(
+            verses_df, words_df, str(output_file), batch_size=1, max_workers=1
+        )
+        for bkv in batch
+    ]
+    assert sorted(processed) == ["B04K1V42", "B04K1V43"]
+    occurrences = pd.read_parquet(output_file)[expected.columns]
+    assert sorted(map(tuple, occurrences.values.tolist())) == sorted(
+        map(tuple, expected.values.tolist())
+    )
+
+
+def test_get_occurrences(words_df, verses_df):
+    occurrences = get_occurrences(verses_df, words_df, "token")
+    found = occurrences[occurrences["occurrence"]]
+    missing = occurrences[~occurrences["occurrence"]]
+    assert sorted(zip(found["verse_id"], found["variantID"], found["wordID"])) == [
+        (1, 0, 0),
+        (2, 1, 0),
+        (2, 2, 1),
+        (3, 5, 2),
+    ]
+    assert missing["variantID"].isna().all()
+    assert sorted(zip(missing["verse_id"], missing["wordID"])) == [
+        (1, 1),
+        (1, 2),
+        (2, 2),
+        (3, 0),
+        (3, 1),
+        (4, 0),
+        (4, 1),
+        (4, 2),
+    ]
+
+
+def test_get_variant_word_lookup():
+    words = pd.DataFrame(
+        {
+            "variant": ["ιησους", "ιησου", "πετρος", "πετρος"],
+            "wordID": pd.array([3, 3, 1, 1], dtype="Int64"),
+            "variantID": pd.array([0, 1, 4, 4], dtype="Int64"),
+        }
+    )
+    assert get_variant_word_lookup(words).tolist() == [3, 3, -1, -1, 1]
+
+
+def test_search_occurrences(tmp_path, words_df, verses_df):
+    verses_df.loc[3, "bkv"] = "B04K1V43"
+    output_file = tmp_path / "occurrences.parquet"
+    processed = [
+        bkv
+        for batch in search_occurrences(
+            verses_df, words_df, str(output_file), batch_size=1, max_workers=1
+        )
+        for bkv in batch
+    ]
+    assert sorted(processed) == ["B04K1V42", "B04K1V43"]
+    occurrences = pd.read_parquet(output_file)
+    assert occurrences.dtypes.to_dict() == {
+        "verse_id": "int64",
+        "variantID": "int64",
+        "occurrence": "bool",
+        "wordID": "int64",
+    }
+    # verse 4 is the only verse of its bkv, so nothing is missing there
+    expected = get_occurrences(verses_df, words_df).fillna({"variantID": -1})
+    assert sorted(map(tuple, occurrences.values.tolist())) == sorted(
+        map(tuple, expected.values.tolist())
+    )
+    assert (occurrences["variantID"] == -1).sum() == 5
+
+
+def test_write_verses_with_missing_version(tmp_path):
+    # the typed verses table applies to all parsed columns
+    assert set(PARSED_VERSES_DTYPES) - {"verse"} <= set(TABLES["verses"])
+
+    # a header without edition version next to one with, parsed like in 03_1_teiparse
+    parsed_dir = tmp_path / "parsed"
+    parsed_dir.mkdir()
+    for name, tei in [
+        ("40329", TEI_SAMPLE),
+        ("40330", TEI_SAMPLE.replace('<edition n="1.2">', "<edition>")),
+    ]:
+        file_path = tmp_path / f"{name}.xml"
+        file_path.write_text(tei, encoding="utf-8")
+        get_data_from_tei(file_path, True, False, True, parsed_dir, parsed_dir)
+    update_partitions(
+        tmp_path / "verses", parsed_dir, ["40329", "40330"], ["40329", "40330"]
+    )
+    verses_df = prepare_verses(read_parsed_verses(tmp_path / "verses"))
+    write_verses(verses_df, str(tmp_path))
+
+    verses = load_table("verses", data_dir=str(tmp_path))
+    assert verses["edition_version"].dtype == "float"
+    assert verses["edition_version"].isna().sum() == len(verses) // 2
+    assert verses["publishing_date"].dtype == "category"
+    assert (verses["lection"] == "NA").any()
+    assert verses["verse_id"].tolist() == list(range(1, len(verses) + 1))
+    # the CSV file marks all missing values as "NA"
+    assert (
+        pd.read_csv(tmp_path / "verses.csv", keep_default_na=False)["edition_version"]
+        .tolist()
+        .count("NA")
+        == len(verses) // 2
+    )
+
+
+def test_corpus_table_roundtrip(tmp_path, verses_df):
+    verses_df["ga"] = ["01", "01", "02", "03"]
+    verses_df.loc[3, "bkv"] = "B01K1V1"
+    write_table(verses_df, "verses", str(tmp_path))
+
+    verses = load_table("verses", data_dir=str(tmp_path))
+    assert verses["ga"].dtype == "category"
+    assert verses["bkv"].dtype == "category"
+    assert verses["verse_id"].dtype == "int64"
+    assert verses.astype({"ga": "object", "bkv": "object"}).equals(
+        verses_df.astype({"text": "string", "transcript": "string"})
+    )
+
+    projected = load_table(
+        "verses", columns=["verse_id"], ga=["01", "03"], data_dir=str(tmp_path)
+    )
+    assert list(projected.columns) == ["verse_id"]
+    assert list(projected["verse_id"]) == [1, 2, 4]
+
+    matthew = load_table(
+        "verses", columns=["verse_id", "ga"], book=["01"], data_dir=str(tmp_path)
+    )
+    assert list(matthew.columns) == ["verse_id", "ga"]
+    assert list(matthew["verse_id"]) == [4]
+
+    # categorical bkvs of a corpus table yield only observed groups
+    batches = list(
+        iter_bkv_batches(matthew.assign(bkv="B01K1V1").astype({"bkv": "category"}))
+    )
+    assert len(batches) == 1 and len(batches[0]) == 1
+
+
+class NTVMRStubHandler(BaseHTTPRequestHandler):
+    """Stub of the NTVMR API: docID 3 is unknown, all other docIDs are served as XML or JSON"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        if self.path.endswith(".zip"):
+            self.send_response(200)
+            self.send_header("content-type", "application/zip")
+            self.send_header("content-length", str(len(self.server.archive)))
+            self.end_headers()
+            self.wfile.write(self.server.archive)
+            return
+        docID = parse_qs(urlparse(self.path).query)["docID"][0]
+        if self.server.failures.get(docID, 0) > 0:
+            self.server.failures[docID] -= 1
+            self.send_response(503)
+            self.send_header("content-length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/transcript"):
+            if docID in self.server.bodies:
+                body = self.server.bodies[docID]
+            elif docID == "3":
+                body = '<error code="1" message="not found"/>'
+            else:
+                body = f'<TEI>\n  <text n="{docID}">  <w>ιησους</w></text></TEI>'
+            content_type = "text/xml;charset=UTF-8"
+        else:
+            body = json.dumps({"docID": int(docID)})
+            content_type = "application/json"
+        data = body.encode("utf-8")
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("content-length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ntvmr_stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), NTVMRStubHandler)
+    server.client_ports = set()
+    server.bodies = {}
+    server.not_modified = 0
+    server.failures = {}
+    server.archive = b""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(
+        utils, "NTVMR_TRANSCRIPT_URL", base_url + "/transcript/?docID={docID}"
+    )
+    monkeypatch.setattr(
+        utils, "NTVMR_MANUSCRIPT_URL", base_url + "/metadata/?docID={docID}"
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_ntvmr_documents(tmp_path, ntvmr_stub):
+    docIDs = list(range(1, 21))
+    error_log_file = str(tmp_path / "errors.log")
+    done = list(
+        download_ntvmr_documents(
+            docIDs, str(tmp_path / "xml"), error_log_file, max_workers=4
+        )
+    )
+    assert sorted(done) == docIDs
+    # connections are pooled instead of opened per document
+    assert len(ntvmr_stub.client_ports) <= 4
+
+    # same files and error log as the sequential download
+    for docID in docIDs:
+        download_ntvmr_transcripts(docID, str(tmp_path), error_log_file)
+        file_name = f"{docID}.xml"
+        assert (tmp_path / "xml" / file_name).exists() == (docID != 3)
+        if docID != 3:
+            assert (tmp_path / "xml" / file_name).read_text() == (
+                tmp_path / file_name
+            ).read_text()
+    assert (
+        tmp_path / "1.xml"
+    ).read_text() == '<TEI><text n="1"><w>ιησους</w></text></TEI>'
+    errors = read_error_log(error_log_file)
+    assert [(e["docID"], e["status"], e["reason"]) for e in errors] == [
+        (3, 200, "not found")
+    ] * 2
+
+    list(
+        download_ntvmr_documents(
+            [5], str(tmp_path / "json"), error_log_file, download_ntvmr_manuscripts
+        )
+    )
+    assert json.loads((tmp_path / "json" / "5.json").read_text()) == {"docID": 5}
+
+
+def test_download_cache(tmp_path, ntvmr_stub):
+    docIDs = [1, 2, 3]
+    manifest_file = str(tmp_path / "manifest.json")
+
+    def refresh():
+        cache = DownloadCache(manifest_file)
+        list(
+            download_ntvmr_documents(
+                docIDs, str(tmp_path), str(tmp_path / "errors.log"), cache=cache
+            )
+        )
+        return cache
+
+    assert refresh().changed == {"1", "2"}
+    written = (tmp_path / "2.xml").read_text()
+
+    # unchanged documents are answered with 304 and not rewritten
+    (tmp_path / "1.xml").write_text("untouched")
+    assert refresh().changed == set()
+    assert ntvmr_stub.not_modified == 2
+    assert (tmp_path / "1.xml").read_text() == "untouched"
+
+    # changed and deleted documents are fetched again
+    ntvmr_stub.bodies["2"] = "<TEI><text>πετρος</text></TEI>"
+    (tmp_path / "1.xml").unlink()
+    assert refresh().changed == {"1", "2"}
+    assert (tmp_path / "2.xml").read_text() != written
+    with open(manifest_file) as f:
+        assert json.load(f)["changed"] == ["1", "2"]
+
+
+def test_download_retries(tmp_path, ntvmr_stub, monkeypatch):
+    monkeypatch.setattr(RetryAdapter, "get_backoff", lambda *args: 0)
+    ntvmr_stub.failures.update({"1": 2, "2": 5})
+    error_log_file = str(tmp_path / "errors.log")
+
+    list(download_ntvmr_documents([1, 2, 4], str(tmp_path), error_log_file, retries=2))
+    assert (tmp_path / "1.xml").exists() and (tmp_path / "4.xml").exists()
+    assert not (tmp_path / "2.xml").exists()
+    assert get_failed_docIDs(error_log_file, clear=True) == {2}
+    assert not os.path.exists(error_log_file)
+
+    # records without docID are kept by the clearing
+    url_to_error_log("http://127.0.0.1/liste/get/", "no xml found", error_log_file)
+    url_to_error_log("http://127.0.0.1/transcript/?docID=3", "timeout", error_log_file)
+    assert get_failed_docIDs(error_log_file, clear=True) == {3}
+    assert [record["url"] for record in read_error_log(error_log_file)] == [
+        "http://127.0.0.1/liste/get/"
+    ]
+    os.remove(error_log_file)
+
+    # retry only the failures of the error log
+    list(download_ntvmr_documents({2}, str(tmp_path), error_log_file, retries=2))
+    assert (tmp_path / "2.xml").exists()
+    assert get_failed_docIDs(error_log_file) == set()
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=100, burst=2)
+    start_time = time.perf_counter()
+    for _ in range(7):
+        limiter.acquire("ntvmr.uni-muenster.de")
+    # the burst is free, the other 5 requests wait for a token each
+    assert time.perf_counter() - start_time >= 0.045
+    start_time = time.perf_counter()
+    limiter.acquire("www.iohannes.com")
+    assert time.perf_counter() - start_time < 0.01
+
+
+def test_fetch_and_extract_zip(tmp_path, ntvmr_stub):
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for idx in range(5):
+            zip_ref.writestr(f"minuscules/{idx}.xml", f"<TEI n='{idx}'/>")
+        zip_ref.writestr("__MACOSX/minuscules/._0.xml", "mac")
+        zip_ref.writestr("minuscules/readme.txt", "readme")
+    ntvmr_stub.archive = archive.getvalue()
+    url = f"http://127.0.0.1:{ntvmr_stub.server_address[1]}/minuscules.zip"
+
+    assert fetch_and_extract_zip(url, str(tmp_path), max_workers=2) == 5
+    assert sorted(p.name for p in (tmp_path / "minuscules").iterdir()) == [
+        f"{idx}.xml" for idx in range(5)
+    ]
+    assert (tmp_path / "minuscules" / "3.xml").read_text() == "<TEI n='3'/>"
+
+    # only missing or changed files are extracted again
+    (tmp_path / "minuscules" / "1.xml").write_text("<TEI n='x'/>")
+    (tmp_path / "minuscules" / "2.xml").unlink()
+    assert fetch_and_extract_zip(url, str(tmp_path), max_workers=2) == 2
+    assert (tmp_path / "minuscules" / "1.xml").read_text() == "<TEI n='1'/>"
+    assert fetch_and_extract_zip(url, str(tmp_path), max_workers=2) == 0
+
+
+def test_error_log(tmp_path):
+    error_log_file = str(tmp_path / "logs" / "errors.log")
+    urls = [f"http://127.0.0.1/transcript/?docID={docID}" for docID in range(50)]
+
+    with ErrorLog(error_log_file) as error_log:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            for url in urls:
+                executor.submit(
+                    url_to_error_log, url, "no xml found", error_log, 503, 4
+                )
+    records = read_error_log(error_log_file)
+    assert sorted(record["docID"] for record in records) == list(range(50))
+    assert {(r["status"], r["attempt"], r["reason"]) for r in records} == {
+        (503, 4, "no xml found")
+    }
+
+    # processes put their records into the queue of a manager
+    with multiprocessing.Manager() as manager:
+        with ErrorLog(error_log_file, manager.Queue()) as error_log:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+                for url in urls[:5]:
+                    executor.submit(url_to_error_log, url, "timeout", error_log)
+    assert len(read_error_log(error_log_file)) == 55
+
+    # lines of the former format are still read for retries
+    with open(error_log_file, "a") as error_log:
+        error_log.write("http://127.0.0.1/transcript/?docID=77; no xml found\n")
+    assert get_failed_docIDs(error_log_file) == set(range(50)) | {77}
+
+
+def test_incremental_parse(tmp_path, tei_sample_file):
+    second_file = tei_sample_file.with_name("40330.xml")
+    second_file.write_text(TEI_SAMPLE.replace("40329", "40330"), encoding="utf-8")
+    files = [str(tei_sample_file), str(second_file)]
+    manifest_file = str(tmp_path / "manifest.json")
+    man_dir, trans_dir = tmp_path / "man", tmp_path / "trans"
+    man_dir.mkdir()
+    trans_dir.mkdir()
+
+    def parse(files):
+        manifest = ParseManifest(manifest_file, clear_only=True)
+        changed = manifest.get_changed_files(files)
+        for file_path in manifest.get_removed_files(files):
+            remove_parsed_files(file_path, str(trans_dir), str(man_dir))
+            manifest.remove(file_path)
+        for file_path in changed:
+            get_data_from_tei(
+                file_path, True, False, True, str(trans_dir), str(man_dir)
+            )
+            manifest.update(file_path)
+        manifest.save()
+        names = [Path(file_path).stem for file_path in manifest.files]
+        updated = [Path(file_path).stem for file_path in changed]
+        update_partitions(str(tmp_path / "verses"), str(trans_dir), names, updated)
+        return changed
+
+    assert parse(files) == files
+    verses = read_partitions(str(tmp_path / "verses"))
+    assert verses.groupby("file").size().to_dict() == {"40329": 4, "40330": 4}
+
+    # touched but unchanged files are not parsed again
+    second_file.touch()
+    assert parse(files) == []
+    assert (
+        ParseManifest(manifest_file, clear_only=False).get_changed_files(files) == files
+    )
+
+    second_file.write_text(
+        TEI_SAMPLE.replace("40329", "40330").replace("πάλιν", "πάλαι"),
+        encoding="utf-8",
+    )
+    first_partition = tmp_path / "verses" / "40329.parquet"
+    first_written = first_partition.stat().st_mtime_ns
+    assert parse(files) == [str(second_file)]
+    # only the partition of the changed file is written again
+    assert first_partition.stat().st_mtime_ns == first_written
+    verses = read_partitions(str(tmp_path / "verses"))
+    assert verses["file"].tolist() == ["40329"] * 4 + ["40330"] * 4
+    assert "παλαι [gap-witnessend]" in verses["transcript"].tolist()
+
+    # outputs of deleted files are removed
+    assert parse(files[:1]) == []
+    assert not (trans_dir / "40330.csv").exists()
+    assert not (tmp_path / "verses" / "40330.parquet").exists()
+    verses = read_partitions(str(tmp_path / "verses"))
+    assert set(verses["file"]) == {"40329"}
+
+
+def test_parse_tei_files_without_verses(tmp_path):
+    file_paths = write_tei_corpus(str(tmp_path / "tei"), 2, 20, lectionary_share=0)
+    parsed_dir = str(tmp_path / "parsed")
+    assert parse_tei_files(file_paths, parsed_dir, max_workers=1) == (file_paths, [])
+    assert len(read_parsed_verses(f"{parsed_dir}/verses")) == 40
+    # the manuscripts are read of the teiHeaders, so no manuscript data is written
+    assert not (tmp_path / "parsed" / "man").exists()
+
+    # all verses of the first file disappear, so do its parsed verses
+    file_paths[0].write_text(
+        re.sub(r"<ab .*?</ab>", "", file_paths[0].read_text(encoding="utf-8")),
+        encoding="utf-8",
+    )
+    assert parse_tei_files(file_paths, parsed_dir, max_workers=1) == (
+        [file_paths[0]],
+        [],
+    )
+    verses = read_parsed_verses(f"{parsed_dir}/verses")
+    assert len(verses) == 20 and set(verses["ga"]) == {"2"}
+    assert not (tmp_path / "parsed" / "trans" / f"{file_paths[0].stem}.csv").exists()
+    # the file is recorded in the manifest, so it is not parsed again
+    assert parse_tei_files(file_paths, parsed_dir, max_workers=1) == ([], [])
+
+
+@pytest.mark.parametrize("engine", ["soup", "stream"])
+def test_get_data_from_tei_well_formedness(tmp_path, tei_sample_file, engine):
+    out_dir = str(tmp_path)
+    result = get_data_from_tei(
+        tei_sample_file, True, False, True, out_dir, out_dir, engine=engine
+    )
+    assert result == {"file": str(tei_sample_file), "well_formed": True, "error": None}
+
+    # the mismatched tag is found by the parse itself, nothing is written
+    tei_sample_file.write_text(TEI_SAMPLE.replace("πάλιν</w>", "πάλιν</x>"))
+    (tmp_path / "40329.csv").unlink()
+    result = get_data_from_tei(
+        tei_sample_file, True, False, True, out_dir, out_dir, engine=engine
+    )
+    assert not result["well_formed"] and "mismatch" in result["error"]
+    assert not (tmp_path / "40329.csv").exists()
+    assert get_data_from_tei(tei_sample_file, True, engine=engine) == (None, None)
+
+
+def test_verse_references_column_wise():
+    verse_ids = pd.Series(
+        [
+            "Matt.1.1",
+            "B04K12V22",
+            "Rom.inscriptio",
+            "Rom.Inscriptio",
+            "B06KsubscriptioV3",
+            "B06K1V1x",
+            "Foo.1.1",
+            "Rom.1",
+            None,
+            "Matt.1.1",
+        ],
+        index=range(10, 20),
+    )
+    # the row function cannot handle missing verse ids, an empty one is not matched either
+    expected = pd.DataFrame({"verse": verse_ids.fillna("")}).apply(
+        bkv_nkv_from_verse_id, axis=1
+    )
+    result = bkv_nkv_from_verse_ids(verse_ids)
+    assert list(result.index) == list(verse_ids.index)
+    for col in ["bkv", "nkv"]:
+        assert (
+            result[col].tolist()
+            == expected[col].where(expected[col].notna(), None).tolist()
+        )
+    assert result.loc[12].tolist() == ["B06KInscriptioV0", "Rom.Inscriptio"]
+    assert result.loc[14].tolist() == ["B06KSubscriptioV0", "Rom.Subscriptio"]
+
+    bkvs = pd.Series(["Matt.1.1", "B04K12V22", "B06KInscriptioV0", None])
+    assert fix_bkvs(bkvs).tolist() == [
+        fix_bkv(pd.Series({"bkv": bkv})) for bkv in bkvs[:3]
+    ] + [None]
+    assert bkvs_to_nkvs(bkvs).tolist() == [
+        bkv_to_nkv(pd.Series({"bkv": bkv})) for bkv in bkvs
+    ]
+
+
+def test_verse_codec():
+    bkvs = pd.Series(
+        ["B01K10V1", "B01K2V13", "B06KSubscriptioV0", "B06K1V1", "B06KInscriptioV0"]
+    )
+    keys = encode_bkvs(bkvs)
+    assert keys.dtype == "Int32"
+    # numeric instead of lexicographic order, inscriptio and subscriptio frame the text of a book
+    assert bkvs[keys.sort_values().index].tolist() == [
+        "B01K2V13",
+        "B01K10V1",
+        "B06KInscriptioV0",
+        "B06K1V1",
+        "B06KSubscriptioV0",
+    ]
+    assert decode_bkvs(keys).tolist() == bkvs.tolist()
+    nkvs = decode_nkvs(keys)
+    assert nkvs.tolist() == [
+        "Matt.10.1",
+        "Matt.2.13",
+        "Rom.Subscriptio",
+        "Rom.1.1",
+        "Rom.Inscriptio",
+    ]
+    assert encode_nkvs(nkvs).equals(keys)
+    assert unpack(bkv_to_key("B27K22V21")) == (27, 22, 21, None)
+
+    # the keys of the parsed references decode to the same bkv and nkv columns
+    references = bkv_nkv_from_verse_ids(
+        pd.Series(
+            ["Matt.1.1", "B04K12V22", "Rom.inscriptio", "B06KsubscriptioV3", "B06K1V1"]
+        )
+    )
+    keys = encode_bkvs(references["bkv"])
+    assert decode_bkvs(keys).tolist() == references["bkv"].tolist()
+    assert decode_nkvs(keys).tolist() == references["nkv"].tolist()
+    assert encode_nkvs(references["nkv"]).equals(keys)
+    # unnormalized bkvs decode to the parsed form as well
+    bkvs = pd.Series(["B04K12V22", "B06KsubscriptioV3", "B06KinscriptioV0"])
+    assert (
+        decode_bkvs(encode_bkvs(bkvs)).tolist()
+        == bkv_nkv_from_verse_ids(bkvs)["bkv"].tolist()
+    )
+
+    invalid = encode_bkvs(pd.Series(["B28K1V1", "B01K1V1x", "Matt.1.1", None]))
+    assert invalid.isna().all()
+    assert nkv_to_key("Foo.1.1") is None and pack(1, 5000, 1) is None
+
+
+def test_remove_diacritics():
+    samples = [
+        "Ἐν ἀρχῇ ἦν ὁ λόγος",
+        "ᾯ ϊ ΰ ǖ",
+        "nullà ascii",
+        # spacing combining mark and combining marks outside the basic multilingual plane
+        "\u0dda \U0001d165",
+        # combining marks without base character, reordered by the normalization
+        "α\u0301\u0313\u0345",
+        "",
+    ]
+    for s in samples:
+        assert remove_diacritics(s) == remove_diacritics_nfkd(s)
+    assert normalize("Ἰησοῦς Χριστός") == "ιησους χριστος"
+    assert normalize_series(pd.Series(["Ἐν ἀρχῇ", None])).tolist() == ["εν αρχη", None]
+
+
+def test_get_words_table(tmp_path):
+    names = pd.DataFrame(
+        {
+            "label:en": ["Jesus", "Nobody"],
+            "gender": ["m", "?"],
+            "label:el": ["Ἰησοῦς", None],
+            "label:el:norm": ["ιησους", None],
+            "alternatives": ["Ἰησοῦ", None],
+            "Nom Sg": ["Ἰησοῦς", None],
+            "Gen Sg": ["Ἰησοῦ", None],
+            "Dat Sg": ["Ἰησοῦ", None],
+            "Akk Sg": ["Ἰησοῦν", None],
+            "Voc Sg": [None, None],
+            "factgrid": ["https://database.factgrid.de/entity/Q1", None],
+        }
+    )
+    names.to_csv(tmp_path / "names.csv", index=False)
+    # the list of nominals is optional
+    words_df = get_words_table(tmp_path / "names.csv", tmp_path / "nominals.csv")
+    assert sorted(words_df["variant"]) == ["ιησου", "ιησουν", "ιησους"]
+    assert set(words_df["factgrid"]) == {"Q1"}
+    assert set(words_df["type"]) == {"name"}
+    assert words_df["variantID"].tolist() == [0, 1, 2]
+
+    nominals = names.drop(columns=["label:el:norm", "alternatives", "factgrid"])
+    nominals[["Nom Pl", "Gen Pl", "Dat Pl", "Akk Pl", "Voc Pl"]] = None
+    nominals["label:el"] = ["λόγος", None]
+    nominals.to_csv(tmp_path / "nominals.csv", index=False)
+    words_df = get_words_table(tmp_path / "names.csv", tmp_path / "nominals.csv")
+    nominal = words_df[words_df["type"] == "nominal"]
+    assert set(nominal["label:el:norm"]) == {"λογος"}
+    assert set(nominal["factgrid"]) == {"NA"}
+    assert words_df["wordID"].nunique() == 2
+
+
+def test_ga_docID_conversion():
+    gas = pd.Series(
+        ["P75", "01", "046", "2814", "L329", "01", None, "X1", "00", "12345"]
+    )
+    docIDs, invalid = gas_to_docIDs(gas)
+    assert docIDs.dtype == "Int32"
+    assert docIDs[:6].tolist() == [10075, 20001, 20046, 32814, 40329, 20001]
+    assert docIDs[:6].tolist() == [
+        ga_to_docID(pd.Series({"docID": None, "ga": ga})) for ga in gas[:6]
+    ]
+    assert invalid.tolist() == [False] * 7 + [True] * 3
+
+    back, invalid = docIDs_to_gas(docIDs)
+    assert back.tolist() == gas[:6].tolist() + [pd.NA] * 4
+    assert back[:6].tolist() == [docID_to_ga(docID) for docID in docIDs[:6]]
+    assert not invalid.any()
+    _, invalid = docIDs_to_gas(pd.Series(["20001", 20001.0, 50000, 30000, "x", None]))
+    assert invalid.tolist() == [False, False, True, True, True, False]
+
+    # the forms ga_to_docID accepts, a prefix separated from its digits and a suffix
+    gas = pd.Series(["L 329", "P-75", "Lect. 329", "2814a"])
+    docIDs, invalid = gas_to_docIDs(gas)
+    assert docIDs.tolist() == [40329, 10075, 40329, 32814]
+    assert docIDs.tolist() == [
+        ga_to_docID(pd.Series({"docID": None, "ga": ga})) for ga in gas
+    ]
+    assert not invalid.any()
+    # ga_to_docID raises on lower case prefixes, column-wise they are invalid
+    _, invalid = gas_to_docIDs(pd.Series(["l329", "p75", "L", "L12345"]))
+    assert invalid.all()
+
+    built, invalid = forms_to_gas(
+        pd.Series(["Papyrus", "Uncial", "Minuscule", "Lectionary", "Other", None]),
+        pd.Series([75, 46.0, 2814, 329, 1, 2]),
+    )
+    assert built.tolist() == ["P75", "046", "2814", "L329", pd.NA, pd.NA]
+    assert invalid.tolist() == [False] * 4 + [True, False]
+
+
+def test_pipeline_runner(tmp_path):
+    (tmp_path / "raw.txt").write_text("raw")
+    # both stages depending on stage a have to run at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def stage(output: str, wait: bool = False, fail: bool = False):
+        def run(data_dir: str):
+            if wait:
+                barrier.wait()
+            if fail:
+                raise RuntimeError("stage failed")
+            Path(data_dir, output).write_text(output)
+
+        return run
+
+    stages = {
+        "a": {"func": stage("a.txt"), "inputs": ["raw.txt"], "outputs": ["a.txt"]},
+        "b": {"func": stage("b.txt", True), "inputs": ["a.txt"], "outputs": ["b.txt"]},
+        "c": {"func": stage("c.txt", True), "inputs": ["a.txt"], "outputs": ["c.txt"]},
+        "d": {
+            "func": stage("d.txt"),
+            "inputs": ["b.txt", "c.txt"],
+            "outputs": ["d.txt"],
+        },
+    }
+    assert get_dependencies(stages) == {
+        "a": set(),
+        "b": {"a"},
+        "c": {"a"},
+        "d": {"b", "c"},
+    }
+
+    def run(targets: list = None, force: bool = False) -> dict:
+        return run_pipeline(targets, str(tmp_path), force, 2, stages)
+
+    assert run() == {"a": "done", "b": "done", "c": "done", "d": "done"}
+    assert set(run().values()) == {"skipped"}
+    # stage a runs again, but writes the same output, so the stages after it are skipped
+    (tmp_path / "raw.txt").write_text("changed")
+    assert run() == {"a": "done", "b": "skipped", "c": "skipped", "d": "skipped"}
+    # only the target and the stages it depends on run
+    assert run(["b"]) == {"a": "skipped", "b": "skipped"}
+    (tmp_path / "d.txt").unlink()
+    assert run(["d"])["d"] == "done"
+
+    stages["c"]["func"] = stage("c.txt", fail=True)
+    stages["b"]["func"] = stage("b.txt")
+    assert run(force=True) == {"a": "done", "b": "done", "c": "failed", "d": "blocked"}
+    with pytest.raises(ValueError):
+        run(["e"])
+
+
+def test_pipeline_teiparse(tmp_path):
+    # a generated corpus, the header of the second file without edition version
+    file_paths = write_tei_corpus(str(tmp_path / "transcriptions" / "ntvmr"), 2, 50)
+    file_paths[1].write_text(
+        file_paths[1]
+        .read_text(encoding="utf-8")
+        .replace('<edition n="1.2">', "<edition>"),
+        encoding="utf-8",
+    )
+    teiparse(str(tmp_path), max_workers=1)
+
+    verses = load_table("verses", data_dir=str(tmp_path))
+    assert len(verses) == 100
+    assert verses["edition_version"].dtype == "float"
+    assert verses[verses["ga"] == "2"]["edition_version"].isna().all()
+    assert (verses[verses["ga"] == "L1"]["edition_version"] == 1.1).all()
+    assert verses["verse_id"].tolist() == list(range(1, len(verses) + 1))
+    # the manuscripts are refreshed of the teiHeaders, without parsing the verses again
+    teiheaders(str(tmp_path), max_workers=1)
+    manuscripts = pd.read_csv(tmp_path / "manuscripts_tei.csv", dtype="string")
+    assert manuscripts["ga"].tolist() == ["2", "L1"]
+
+    # nothing changed, so nothing is parsed again
+    manifest = ParseManifest(str(tmp_path / "parsed" / "manifest.json"), True)
+    assert manifest.get_changed_files(file_paths) == []
+
+
+def test_generate_tei(tmp_path):
+    # the same seed generates the same document
+    assert generate_tei(50, seed=1) == generate_tei(50, seed=1)
+
+    file_paths = write_tei_corpus(str(tmp_path), 2, 200, split=0.5)
+    assert [file_path.name for file_path in file_paths] == ["40001.xml", "30002.xml"]
+    lectionary, minuscule = (
+        TEIFile(file_path, True, False) for file_path in file_paths
+    )
+    assert (lectionary.ga, minuscule.ga) == ("L1", "2")
+    assert lectionary.alt_identifiers == {"Liste": "40001"}
+
+    # split verses are merged, so every generated verse is one transcription
+    lection_verses = lectionary.get_transcription_list()
+    assert len(lection_verses) == 200
+    assert all(verse["lection"].startswith("Lect ") for verse in lection_verses)
+    verses = minuscule.get_transcription_list()
+    assert [verse["verse"] for verse in verses[:2]] == ["B01K1V1", "B01K1V2"]
+    assert all(verse["lection"] is None for verse in verses)
+    transcripts = " ".join(verse["transcript"] for verse in verses)
+    assert "απε κριθη" not in transcripts and "απεκριθη" in transcripts
+    for marker in ["[gap-lacuna-char-", "[gap-unclear-", "[gap-supplied-", "θυ"]:
+        assert marker in transcripts
@@ -1,16 +1,42 @@
-import io
 import json
 import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import re
+import tempfile
 import requests
 import xml.etree.ElementTree as ET
 import zipfile
+import zlib
 import csv
+import concurrent.futures
 
 from pathlib import Path
-from constants import BOOK_INFO
+from lxml import etree
+from scipy.sparse import csr_matrix
+from constants import (
+    BOOK_INFO,
+    BOOK_NUMBERS_EN,
+    DBPEDIA_SPARQL_ENDPOINT,
+    DBPEDIA_SPARQL_QUERY,
+)
+from converters import docIDs_to_gas, forms_to_gas
+from corpus import DATA_DIR, write_table
+from download_cache import DownloadCache
+from error_log import ErrorLog, get_error_record, read_error_log
+from http_adapter import RateLimiter, RetryAdapter
+from matchers import MATCHERS
+from normalization import gap_clean, gap_clean_series, normalize_series
+from parse_manifest import ParseManifest
 from TEIFile import TEIFile
+from TEIStreamFile import TEIStreamFile
+from verse_codec import encode_bkvs
+
+# NTVMR API urls of transcriptions and manuscript metadata, {docID} is replaced by the document ID
+NTVMR_TRANSCRIPT_URL = "http://ntvmr.uni-muenster.de/community/vmr/api/transcript/get/?docID={docID}&pageID=ALL&format=teiraw"  # &filterNoise=true
+NTVMR_MANUSCRIPT_URL = "https://ntvmr.uni-muenster.de/community/vmr/api/metadata/manuscript/get/?docID={docID}&detail=10&format=json"
 
 
 def check_and_create_file(file_path):
@@ -30,50 +56,88 @@ def check_and_create_file(file_path):
             print(f"File created: {file_path}")
 
 
-def url_to_error_log(url: str, reason: str, error_log_file: str):
-    """Print an error message to given log file
+def url_to_error_log(
+    url: str,
+    reason: str,
+    error_log_file: str or ErrorLog,
+    status: int = None,
+    attempt: int = None,
+):
+    """Write the structured record (JSON line) of an error to given log
 
     :param url: Url string which produced an error
     :param reason: the error text
-    :param error_log_file: path to log file
+    :param error_log_file: path to log file or the ErrorLog sink of a parallel download
+    :param status: HTTP status code of the response, None if there was no response
+    :param attempt: number of attempts made, None if unknown
     :return:
     """
-    check_and_create_file(error_log_file)
-
-    with open(error_log_file, "a") as error_log:
-        error_log.write(f"{url}; {reason}\n")
-
-
-def fetch_and_format_xml(url: str, output_file: str, error_log_file: str):
+    if isinstance(error_log_file, ErrorLog):
+        error_log_file.log(url, reason, status, attempt)
+        return
+
+    os.makedirs(os.path.dirname(error_log_file) or ".", exist_ok=True)
+    with open(error_log_file, "a", encoding="utf-8") as error_log:
+        record = get_error_record(url, reason, status, attempt)
+        error_log.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def fetch_and_format_xml(
+    url: str,
+    output_file: str,
+    error_log_file: str or ErrorLog,
+    session: requests.Session = None,
+    cache: DownloadCache = None,
+):
     """Fetches an XML file from the given URL, formats it to be humanreadable and writes it to an output file
 
     :param url: URL to the XML
     :param output_file: Path to the output file
-    :param error_log_file: Path to the log file
+    :param error_log_file: Path to the log file or the ErrorLog sink of a parallel download
+    :param session: HTTP session to reuse its pooled connections, a new connection is opened if None
+    :param cache: download cache to only fetch and write changed documents, everything is written if None
     :return:
     """
-    check_and_create_file(error_log_file)
-
     try:
-        response = requests.get(url)
+        headers = cache.request_headers(output_file) if cache else None
+        response = (session or requests).get(url, headers=headers)
+        if cache and response.status_code == 304:
+            # not modified since the last download
+            return
         if response.status_code == 200 and "text/xml" in response.headers.get(
             "content-type"
         ):
             root = ET.fromstring(response.text)
             # Check for <error> tag with code attribute equal to 1
             if root.tag == "error":
-                url_to_error_log(url, root.get("message"), error_log_file)
+                url_to_error_log(
+                    url,
+                    root.get("message"),
+                    error_log_file,
+                    response.status_code,
+                    getattr(response, "attempt", None),
+                )
                 return
             # format XML
             xml_string = format_xml(root)
+            if cache and not cache.update(output_file, response.headers, xml_string):
+                return
             # Write the string to the output file without any formatting
             with open(output_file, "w") as f:
                 f.write(xml_string)
         else:
-            url_to_error_log(url, "no xml found", error_log_file)
+            url_to_error_log(
+                url,
+                "no xml found",
+                error_log_file,
+                response.status_code,
+                getattr(response, "attempt", None),
+            )
 
     except Exception as e:
-        url_to_error_log(url, str(e), error_log_file)
+        url_to_error_log(
+            url, str(e), error_log_file, attempt=getattr(e, "attempt", None)
+        )
 
 
 def format_xml(root: ET.Element) -> str:
@@ -105,43 +169,126 @@ def check_xml(file_path: str, parser) -> str or None:
         return None
 
 
-def fetch_and_format_json(url: str, output_file: str, error_log_file: str):
+def fetch_and_format_json(
+    url: str,
+    output_file: str,
+    error_log_file: str or ErrorLog,
+    session: requests.Session = None,
+    cache: DownloadCache = None,
+):
     """Fetches an JSON file from the given URL, formats it to be humanreadable and writes it to an output file
 
     :param url: URL to the JSON
     :param output_file: Path to the output file
-    :param error_log_file: Path to the log file
+    :param error_log_file: Path to the log file or the ErrorLog sink of a parallel download
+    :param session: HTTP session to reuse its pooled connections, a new connection is opened if None
+    :param cache: download cache to only fetch and write changed documents, everything is written if None
     :return:
     """
     try:
-        response = requests.get(url)
+        headers = cache.request_headers(output_file) if cache else None
+        response = (session or requests).get(url, headers=headers)
+        if cache and response.status_code == 304:
+            # not modified since the last download
+            return
         if response.status_code == 200 and "application/json" in response.headers.get(
             "content-type"
         ):
             data = response.json()
             formatted_json = json.dumps(data, indent=4)
+            if cache and not cache.update(
+                output_file, response.headers, formatted_json
+            ):
+                return
 
             with open(output_file, "w", encoding="utf-8") as file:
                 file.write(formatted_json)
         else:
-            url_to_error_log(url, "no json found", error_log_file)
+            url_to_error_log(
+                url,
+                "no json found",
+                error_log_file,
+                response.status_code,
+                getattr(response, "attempt", None),
+            )
 
     except requests.RequestException as e:
-        url_to_error_log(url, str(e), error_log_file)
+        url_to_error_log(
+            url, str(e), error_log_file, attempt=getattr(e, "attempt", None)
+        )
+
+
+def file_crc32(file_path: str, chunk_size: int = 1 << 20) -> int:
+    """Compute the CRC-32 checksum of a file as stored for the members of a zip file
+
+    :param file_path: path of the file
+    :param chunk_size: number of bytes read at once
+    :return: CRC-32 checksum
+    """
+    crc = 0
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
 
 
-def fetch_and_extract_zip(url: str, extract_dir: str):
+def extract_zip_members(zip_path: str, members: list, extract_dir: str) -> int:
+    """Extract members of a zip file, skipping members already extracted with the same size and CRC
+
+    :param zip_path: path of the zip file
+    :param members: names of the members to extract
+    :param extract_dir: Output directory where the members should be extracted to
+    :return: number of members extracted
+    """
+    extracted = 0
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        for member in members:
+            info = zip_ref.getinfo(member)
+            target = os.path.join(extract_dir, member)
+            if (
+                os.path.exists(target)
+                and os.path.getsize(target) == info.file_size
+                and file_crc32(target) == info.CRC
+            ):
+                continue
+            zip_ref.extract(info, extract_dir)
+            extracted += 1
+    return extracted
+
+
+def fetch_and_extract_zip(
+    url: str,
+    extract_dir: str,
+    session: requests.Session = None,
+    max_workers: int = 4,
+    chunk_size: int = 1 << 20,
+) -> int:
     """Fetches and extracts a zip file from the given URL to given directory
 
+    The archive is streamed to a temporary file and its XML files are extracted in parallel, skipping files which are
+    already extracted and unchanged.
+
     :param url: URL to the ZIP
     :param extract_dir: Output directory where ZIP should be extracted to
-    :return:
+    :param session: HTTP session to reuse its pooled connections, a new connection is opened if None
+    :param max_workers: number of threads extracting files
+    :param chunk_size: number of bytes of the download written at once
+    :return: number of files extracted
     """
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            with zipfile.ZipFile(io.BytesIO(response.content)) as zip_ref:
-                os.makedirs(extract_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory() as tmp_dir, (session or requests).get(
+            url, stream=True
+        ) as response:
+            if response.status_code != 200:
+                print("Failed to download the file")
+                return 0
+
+            zip_path = os.path.join(tmp_dir, "archive.zip")
+            with open(zip_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+
+            with zipfile.ZipFile(zip_path) as zip_ref:
                 # Extract only XML files from the ZIP file
                 # Filter XML files and extract only those not containing "*MAC*"
                 xml_files = [
@@ -149,56 +296,189 @@ def fetch_and_extract_zip(url: str, extract_dir: str):
                     for f in zip_ref.namelist()
                     if f.lower().endswith(".xml") and "__MAC" not in f
                 ]
-                for xml_file in xml_files:
-                    zip_ref.extract(xml_file, extract_dir)
-        else:
-            print("Failed to download the file")
+            # create the directories upfront, so the threads do not race creating them
+            for directory in {os.path.dirname(f) for f in xml_files}:
+                os.makedirs(os.path.join(extract_dir, directory), exist_ok=True)
+
+            # every thread extracts its share of files with its own handle of the zip file
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers
+            ) as executor:
+                return sum(
+                    executor.map(
+                        lambda members: extract_zip_members(
+                            zip_path, members, extract_dir
+                        ),
+                        [xml_files[i::max_workers] for i in range(max_workers)],
+                    )
+                )
     except requests.RequestException as e:
         print(f"Error downloading {url}: {e}")
+        return 0
 
 
 def download_ntvmr_transcripts(
-    docID: int, path: str, error_log_file: str, overwrite: bool = True
+    docID: int,
+    path: str,
+    error_log_file: str or ErrorLog,
+    overwrite: bool = True,
+    session: requests.Session = None,
+    cache: DownloadCache = None,
 ):
     """Download a transcription of a given docID from NTVMR
 
     :param docID: documentID of the manuscript to download transcription of
     :param path: directory where to save transcription
-    :param error_log_file: Path to the log file
+    :param error_log_file: Path to the log file or the ErrorLog sink of a parallel download
     :param overwrite: boolean to select if file should be overwritten if it already exists
+    :param session: HTTP session to reuse its pooled connections, a new connection is opened if None
+    :param cache: download cache to only fetch and write changed documents, everything is written if None
     :return:
     """
-    url = f"http://ntvmr.uni-muenster.de/community/vmr/api/transcript/get/?docID={docID}&pageID=ALL&format=teiraw"  # &filterNoise=true
+    url = NTVMR_TRANSCRIPT_URL.format(docID=docID)
     output_file = f"{path}/{docID}.xml"
 
     if not os.path.exists(output_file) or overwrite:
         # if file does not already do exist or overwrite is true
-        fetch_and_format_xml(url, output_file, error_log_file)
+        fetch_and_format_xml(url, output_file, error_log_file, session, cache)
     # else:
     #    print(f"File already exists: {output_file}")
 
 
 def download_ntvmr_manuscripts(
-    docID: int, path: str, error_log_file: str, overwrite: bool = True
+    docID: int,
+    path: str,
+    error_log_file: str or ErrorLog,
+    overwrite: bool = True,
+    session: requests.Session = None,
+    cache: DownloadCache = None,
 ):
     """Download metadata of a given docID from NTVMR
 
     :param docID: documentID of the manuscript to download metadata of
     :param path: directory where to save metadata file
-    :param error_log_file: Path to the log file
+    :param error_log_file: Path to the log file or the ErrorLog sink of a parallel download
     :param overwrite: boolean to select if file should be overwritten if it already exists
+    :param session: HTTP session to reuse its pooled connections, a new connection is opened if None
+    :param cache: download cache to only fetch and write changed documents, everything is written if None
     :return:
     """
-    url = f"https://ntvmr.uni-muenster.de/community/vmr/api/metadata/manuscript/get/?docID={docID}&detail=10&format=json"
+    url = NTVMR_MANUSCRIPT_URL.format(docID=docID)
     output_file = f"{path}/{docID}.json"
 
     if not os.path.exists(output_file) or overwrite:
         # if file does not already do exist or overwrite is true
-        fetch_and_format_json(url, output_file, error_log_file)
+        fetch_and_format_json(url, output_file, error_log_file, session, cache)
     # else:
     #    print(f"File already exists: {output_file}")
 
 
+def create_session(
+    pool_size: int = 16,
+    retries: int = 3,
+    timeout: float = 60,
+    rate_limit: float = None,
+) -> requests.Session:
+    """Create an HTTP session keeping up to pool_size connections per host alive between requests
+
+    Failed requests (connection errors, timeouts, 429 and 5xx responses) are retried with jittered exponential
+    backoff.
+
+    :param pool_size: maximum number of persistent connections per host, should match the number of download threads
+    :param retries: number of retries of a failed request
+    :param timeout: timeout of the requests in seconds
+    :param rate_limit: maximum number of requests per second per host, no limit if None
+    :return: requests session
+    """
+    session = requests.Session()
+    adapter = RetryAdapter(
+        retries=retries,
+        timeout=timeout,
+        rate_limiter=RateLimiter(rate_limit) if rate_limit else None,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        pool_block=True,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_ntvmr_documents(
+    docIDs: list,
+    path: str,
+    error_log_file: str,
+    download=download_ntvmr_transcripts,
+    overwrite: bool = True,
+    max_workers: int = 16,
+    cache: DownloadCache = None,
+    retries: int = 3,
+    timeout: float = 60,
+    rate_limit: float = None,
+):
+    """Generator downloading documents from NTVMR concurrently and yielding the docIDs as they are completed
+
+    Downloads are I/O bound, so they run in threads sharing one HTTP session, whose pooled connections are reused for
+    all requests instead of opening a new connection per document.
+
+    :param docIDs: documentIDs of the manuscripts to download
+    :param path: directory where to save the files
+    :param error_log_file: Path to the log file
+    :param download: download function (download_ntvmr_transcripts or download_ntvmr_manuscripts)
+    :param overwrite: boolean to select if file should be overwritten if it already exists
+    :param max_workers: maximum number of concurrent downloads (and persistent connections)
+    :param cache: download cache to only fetch and write changed documents, it is saved after all downloads
+    :param retries: number of retries of a failed request
+    :param timeout: timeout of the requests in seconds
+    :param rate_limit: maximum number of requests per second per host, no limit if None
+    :return: generator of docIDs
+    """
+    os.makedirs(path, exist_ok=True)
+
+    # errors of all threads are collected by one sink writing the log file
+    with ErrorLog(error_log_file) as error_log, create_session(
+        max_workers, retries, timeout, rate_limit
+    ) as session, concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        futures = {
+            executor.submit(
+                download, docID, path, error_log, overwrite, session, cache
+            ): docID
+            for docID in docIDs
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Exception occurred for {futures[future]}: {e}")
+            yield futures[future]
+
+    if cache:
+        cache.save()
+
+
+def get_failed_docIDs(error_log_file: str, clear: bool = False) -> set:
+    """Get the docIDs of the downloads logged as failed in an error log to retry only them
+
+    :param error_log_file: Path to the log file
+    :param clear: boolean to select if the records of the docIDs should be removed from the log file, so it only holds
+        the failures of the retry (and the records without docID, like the ones of the metadata list)
+    :return: set of docIDs
+    """
+    records = read_error_log(error_log_file)
+    docIDs = {record["docID"] for record in records if record["docID"] is not None}
+    if clear and os.path.exists(error_log_file):
+        kept = [record for record in records if record["docID"] is None]
+        if kept:
+            with open(error_log_file, "w", encoding="utf-8") as error_log:
+                for record in kept:
+                    error_log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            os.remove(error_log_file)
+    return docIDs
+
+
 def concat_raw_text_from_tags(tags: list, exception_list: list) -> str:
     """Concatenate texts of multiple tags to space seperated string
 
@@ -224,33 +504,337 @@ def get_data_from_tei(
     write_to_file: bool = False,
     trans_out_dir: str = "../data/parsed/trans",
     man_out_dir: str = "../data/parsed/man",
+    engine: str = "soup",
+    header_only: bool = False,
 ) -> tuple:
     """Wrapper function to extract manuscript and verse data from TEI file
 
-    :param man_out_dir:
+    :param engine: "soup" to load the whole document with BeautifulSoup, "stream" to stream through it (flat memory)
+    :param header_only: set True to only read the teiHeader for the manuscript data, verses data is None then
+    :param man_out_dir: directory of the manuscript data files, the manuscript data is not written if None
     :param trans_out_dir:
     :param verbose:
     :param clear_only: set True to get GAP indicators for supplied and illegible text
     :param write_to_file: set True to write results to files
     :param tei_file_path: TEI file path
-    :return: tupel with manuscript and verses data
+    :return: tupel with manuscript and verses data ((None, None) if the file is not well-formed), if write_to_file is
+        set a dictionary of file, well_formed (None if header_only is set) and error (message of the XML syntax error)
+        instead
     """
-    tei = TEIFile(tei_file_path, clear_only, verbose)
+    if header_only:
+        tei = TEIFile(tei_file_path, clear_only, verbose, header_only=True)
+    elif engine == "stream":
+        tei = TEIStreamFile(tei_file_path, clear_only, verbose)
+    elif engine == "soup":
+        tei = TEIFile(tei_file_path, clear_only, verbose)
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
     file_name = Path(tei_file_path).stem
-    man_data = tei.get_manuscript_data()
-    trans_data = tei.get_transcription_list()
 
-    if not write_to_file:
+    # the well-formedness is checked while parsing, the stream engine only finds errors in the body while iterating
+    error = tei.parse_error
+    if error is None:
+        try:
+            man_data = tei.get_manuscript_data()
+            trans_data = None if header_only else tei.get_transcription_list()
+        except etree.XMLSyntaxError as e:
+            error = str(e)
+    # in header only mode the body is never read, so its well-formedness is unknown (None)
+    well_formed = tei.well_formed if error is None else False
+    result = {"file": str(tei_file_path), "well_formed": well_formed, "error": error}
+
+    if error is not None:
+        print(f"Malformed XML; {error} for file {tei_file_path}") if verbose else None
+        return result if write_to_file else (None, None)
+    elif not write_to_file:
         return man_data, trans_data
     else:
-        with open(f"{man_out_dir}/{file_name}.csv", "w", newline="") as file1:
-            w = csv.DictWriter(file1, man_data.keys())
-            w.writeheader()
-            w.writerow(man_data)
-        with open(f"{trans_out_dir}/{file_name}.csv", "w", newline="") as file2:
+        if man_out_dir is not None:
+            with open(f"{man_out_dir}/{file_name}.csv", "w", newline="") as file1:
+                w = csv.DictWriter(file1, man_data.keys())
+                w.writeheader()
+                w.writerow(man_data)
+        if header_only:
+            return result
+        trans_file = f"{trans_out_dir}/{file_name}.csv"
+        if not trans_data:
+            # a document without verses has no verses file, an outdated one is removed
+            if os.path.exists(trans_file):
+                os.remove(trans_file)
+            return result
+        with open(trans_file, "w", newline="") as file2:
             w = csv.DictWriter(file2, trans_data[0].keys())
             w.writeheader()
             w.writerows(trans_data)
+        return result
+
+
+def remove_parsed_files(
+    tei_file_path: str,
+    trans_out_dir: str = "../data/parsed/trans",
+    man_out_dir: str = "../data/parsed/man",
+):
+    """Remove the files written by get_data_from_tei for a TEI file
+
+    :param tei_file_path: TEI file path
+    :param trans_out_dir: directory of the verses data files
+    :param man_out_dir: directory of the manuscript data files, None if they are not written
+    :return:
+    """
+    file_name = Path(tei_file_path).stem
+    for out_dir in (man_out_dir, trans_out_dir):
+        if out_dir is None:
+            continue
+        out_file = f"{out_dir}/{file_name}.csv"
+        if os.path.exists(out_file):
+            os.remove(out_file)
+
+
+def update_partitions(dataset_dir: str, parts_dir: str, names: list, updated: list):
+    """Update a dataset partitioned by the CSV files (parts) of a directory, like the verses of all TEI files: one
+    parquet file per part, named like it
+
+    The rows of every partition are marked by the name of its part in the column 'file'. Only the partitions of the
+    parts updated (or not yet written) are written, the partitions of parts not in names are removed. The other
+    partitions are neither read nor written.
+
+    :param dataset_dir: directory of the partitions
+    :param parts_dir: directory of the parts
+    :param names: names of all parts of the dataset (file names without suffix)
+    :param updated: names of the parts which changed since the last update
+    :return:
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    names = set(names)
+    updated = set(updated)
+    for partition in Path(dataset_dir).glob("*.parquet"):
+        if partition.stem not in names:
+            partition.unlink()
+    for name in sorted(names):
+        partition = Path(f"{dataset_dir}/{name}.parquet")
+        if name not in updated and partition.exists():
+            continue
+        part_file = f"{parts_dir}/{name}.csv"
+        if os.path.exists(part_file):
+            part = pd.read_csv(part_file, dtype="string")
+            part.assign(file=name).to_parquet(partition, index=False)
+        elif partition.exists():
+            partition.unlink()
+
+
+def read_partitions(dataset_dir: str, dtype: dict = None) -> pd.DataFrame:
+    """Read all partitions of a dataset (see update_partitions) into one dataframe, ordered by their names
+
+    The dataframe covers the whole dataset, so tables numbered over all rows (like the verse_id of the verses table)
+    are still built of all partitions.
+
+    :param dataset_dir: directory of the partitions
+    :param dtype: types of the columns, columns not given (and missing values) stay strings
+    :return: pandas dataframe of the dataset
+    """
+    partitions = sorted(Path(dataset_dir).glob("*.parquet"))
+    if not partitions:
+        return pd.DataFrame(columns=["file"], dtype="string")
+    dataset = pd.concat(
+        [pd.read_parquet(partition) for partition in partitions], ignore_index=True
+    )
+    if dtype is not None:
+        dataset = dataset.astype(
+            {col: col_type for col, col_type in dtype.items() if col in dataset}
+        )
+    return dataset
+
+
+def parse_tei_files(
+    raw_files: list,
+    parsed_dir: str,
+    clear_only: bool = True,
+    max_workers: int = None,
+    progress=None,
+) -> (list, list):
+    """Parse the new or changed TEI files in parallel and update the partitioned verses of all parsed files (see
+    ParseManifest and update_partitions)
+
+    The verses of every TEI file are written to the directory 'trans' of parsed_dir and its partition to the
+    directory 'verses', the outputs of removed or malformed files are removed again. The manuscripts are not written,
+    as they are read of the teiHeaders only (see read_tei_manuscripts).
+
+    :param raw_files: paths of all TEI files
+    :param parsed_dir: directory of the parsed data (like ../data/parsed)
+    :param clear_only: set True to get GAP indicators for supplied and illegible text
+    :param max_workers: number of parsing processes (defaults to the number of processors)
+    :param progress: progress bar wrapping an iterable, like tqdm, or None
+    :return: tuple of the lists of the well-formed and of the malformed (or failed) files parsed
+    """
+    trans_out_dir = f"{parsed_dir}/trans"
+    os.makedirs(trans_out_dir, exist_ok=True)
+
+    # only new or changed files (or files parsed with another clear_only setting) are parsed
+    manifest = ParseManifest(f"{parsed_dir}/manifest.json", clear_only)
+    changed_files = manifest.get_changed_files(raw_files)
+    print(f"{len(changed_files)} of {len(raw_files)} files to parse")
+    # remove the outputs of deleted files
+    for file_path in manifest.get_removed_files(raw_files):
+        remove_parsed_files(file_path, trans_out_dir, None)
+        manifest.remove(file_path)
+
+    # the well-formedness is checked by the parse itself
+    well_formed_files = []
+    malformed_files = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                get_data_from_tei,
+                file_path,
+                clear_only=clear_only,
+                write_to_file=True,
+                trans_out_dir=trans_out_dir,
+                man_out_dir=None,
+            ): file_path
+            for file_path in changed_files
+        }
+        completed = concurrent.futures.as_completed(futures)
+        if progress is not None:
+            completed = progress(completed, total=len(futures))
+        # record the parsed files in the manifest
+        for future in completed:
+            try:
+                result = future.result()
+            except Exception as e:
+                # the outputs of a failed parse are outdated, so the file is handled like a malformed one
+                print(f"Error: {e} for file {futures[future]}")
+                malformed_files.append(futures[future])
+                continue
+            if result["well_formed"]:
+                well_formed_files.append(futures[future])
+                manifest.update(futures[future])
+            else:
+                malformed_files.append(futures[future])
+
+    # remove the outputs of changed files which are malformed (or failed to parse) now
+    for file_path in malformed_files:
+        remove_parsed_files(file_path, trans_out_dir, None)
+        manifest.remove(file_path)
+    manifest.save()
+    print(f"{len(malformed_files)} malformed files: {malformed_files}")
+
+    # update the partitions, only the ones of the TEI files parsed in this run are written
+    names = [Path(file_path).stem for file_path in manifest.files]
+    updated = [Path(file_path).stem for file_path in well_formed_files]
+    update_partitions(f"{parsed_dir}/verses", trans_out_dir, names, updated)
+    return well_formed_files, malformed_files
+
+
+# column types of the partitioned verses of the parsed TEI files (see get_data_from_tei and TEIFile.header_data)
+PARSED_VERSES_DTYPES = {
+    "lection": "string",
+    "verse": "string",
+    "transcript": "string",
+    "text": "string",
+    "publisher": "string",
+    "source": "string",
+    "ga": "string",
+    "sponsor": "string",
+    "founder": "string",
+    "edition_version": "float",
+    "edition_date": "string",
+    "publishing_date": "string",
+    "encoding_version": "float",
+}
+
+
+def read_parsed_verses(dataset_dir: str) -> pd.DataFrame:
+    """Read the partitioned verses of all parsed TEI files (see update_partitions)
+
+    :param dataset_dir: directory of the partitions
+    :return: pandas dataframe of the verses, without the origin column 'file'
+    """
+    return read_partitions(dataset_dir, PARSED_VERSES_DTYPES).drop(columns=["file"])
+
+
+def prepare_verses(verses_df: pd.DataFrame) -> pd.DataFrame:
+    """Prepare the parsed verses for the verses table: convert the verse ids to bkv and nkv, clean the texts of verses
+    parsed without text, mark missing strings as "NA" and number the verses sorted by GA and verse
+
+    Missing numbers (like the edition_version of a header without edition) stay missing, as "NA" is no number of the
+    typed verses table (see corpus.TABLES).
+
+    :param verses_df: pandas dataframe of the parsed verses (see read_parsed_verses)
+    :return: pandas dataframe of the verses table
+    """
+    # Convert the verse ids to the bkv and nkv columns (column-wise, each distinct verse id is converted once)
+    verses_df[["bkv", "nkv"]] = bkv_nkv_from_verse_ids(verses_df["verse"])
+    verses_df = verses_df.drop(columns=["verse"]).dropna(subset=["transcript"])
+
+    # the parser emits the text along with the transcript, only verses parsed before (without text) are cleaned here
+    if "text" not in verses_df.columns:
+        verses_df["text"] = pd.Series(pd.NA, index=verses_df.index, dtype="string")
+    missing_text = verses_df["text"].isna()
+    verses_df.loc[missing_text, "text"] = gap_clean_series(
+        verses_df.loc[missing_text, "transcript"]
+    )
+
+    string_columns = verses_df.select_dtypes(include=["object", "string"]).columns
+    verses_df[string_columns] = verses_df[string_columns].fillna("NA")
+
+    # packed integer key of the BKV (see verse_codec.py), sorting on it orders chapters and verses numerically
+    verses_df["verse_key"] = encode_bkvs(verses_df["bkv"])
+    # sort by GA then by verse
+    verses_df = verses_df.sort_values(by=["ga", "verse_key"])
+    # add unique integer verse_id, as the transcription (or metadata like encoding_version or edition_version) can
+    # change over time
+    verses_df["verse_id"] = range(1, len(verses_df) + 1)
+    return verses_df
+
+
+def write_verses(verses_df: pd.DataFrame, data_dir: str = DATA_DIR):
+    """Write the verses table as CSV file (missing values as "NA") and as typed corpus table
+
+    :param verses_df: pandas dataframe of the verses table (see prepare_verses)
+    :param data_dir: data directory
+    :return:
+    """
+    verses_df.to_csv(
+        f"{data_dir}/verses.csv", index=False, index_label="index", na_rep="NA"
+    )
+    write_table(verses_df, "verses", data_dir)
+
+
+def _read_tei_manuscript(tei_file_path: str) -> dict or None:
+    """Read the manuscript data of the teiHeader of a TEI file (see read_tei_manuscripts)
+
+    :param tei_file_path: TEI file path
+    :return: dictionary of the manuscript data or None if the teiHeader is not well-formed
+    """
+    return get_data_from_tei(tei_file_path, True, header_only=True)[0]
+
+
+def read_tei_manuscripts(
+    raw_files: list, max_workers: int = None, progress=None
+) -> pd.DataFrame:
+    """Read the manuscripts of TEI files in parallel, reading their teiHeaders only
+
+    The manuscript data is part of the teiHeader, so the manuscripts are refreshed without parsing the verses. As the
+    body is not read, the well-formedness of the files is unknown: files with malformed teiHeader are skipped, files
+    with malformed body are kept. Neither the parse manifest nor the parsed verses are touched.
+
+    :param raw_files: paths of the TEI files
+    :param max_workers: number of reading processes (defaults to the number of processors)
+    :param progress: progress bar wrapping an iterable, like tqdm, or None
+    :return: pandas dataframe of the manuscripts (ga,docID,label,source) sorted by GA and without duplicates
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_read_tei_manuscript, raw_files, chunksize=64)
+        if progress is not None:
+            results = progress(results, total=len(raw_files))
+        manuscripts_df = pd.DataFrame(
+            [man_data for man_data in results if man_data is not None],
+            columns=["ga", "docID", "label", "source"],
+        )
+    manuscripts_df = manuscripts_df.astype(
+        {col: MANUSCRIPTS_DTYPES[col] for col in manuscripts_df.columns}
+    )
+    return manuscripts_df.sort_values(by="ga").drop_duplicates()
 
 
 def fix_bkv(row: pd.Series) -> str or None:
@@ -356,6 +940,110 @@ def bkv_nkv_from_verse_id(row: pd.Series, verse_id_col: str = "verse") -> pd.Ser
     return row
 
 
+# verse id formats in the order bkv_nkv_from_verse_id checks them, combined to check them in one pass
+VERSE_ID_PATTERN = re.compile(
+    r"(?P<nkv_book>[1-3A-Za-z]+)\.(?P<nkv_chapter>\d+)\.(?P<nkv_verse>\d+)"
+    r"|B(?P<bkv_book>\d{2})K(?P<bkv_chapter>\d+)V(?P<bkv_verse>\d+)"
+    r"|(?P<nkvs_book>[1-3A-Za-z]+)\.(?P<nkvs_scriptio>inscriptio|subscriptio)"
+    r"|B(?P<bkvs_book>\d{2})K(?P<bkvs_scriptio>inscriptio|subscriptio|Inscriptio|Subscriptio)V\d+"
+)
+
+
+def _extract_unique(
+    values: pd.Series, pattern: re.Pattern
+) -> (np.ndarray, pd.DataFrame):
+    """Match a pattern at the start of the unique values of a column only, as verse ids repeat in every manuscript
+
+    :param values: pandas series of strings
+    :param pattern: compiled pattern with named groups
+    :return: tuple of the codes of the values (-1 for missing values) and a pandas dataframe of the groups matched in
+        every unique value (None if not matched)
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype="object")
+    groups = uniques.str.extract(f"^(?:{pattern.pattern})")
+    groups.insert(0, "value", uniques)
+    return codes, groups.astype("object").where(groups.notna(), None)
+
+
+def _take_unique(codes: np.ndarray, unique_values: pd.Series, index) -> pd.Series:
+    """Expand the values computed for the unique values of a column to the whole column
+
+    :param codes: codes of the column (-1 for missing values)
+    :param unique_values: pandas series of the values computed for the unique values
+    :param index: index of the column
+    :return: pandas series of the values (None for missing values)
+    """
+    values = unique_values.to_numpy(dtype="object")
+    values = np.append(np.where(pd.isna(values), None, values), None)
+    return pd.Series(values[codes], index=index, dtype="object")
+
+
+def fix_bkvs(bkvs: pd.Series) -> pd.Series:
+    """Column-wise version of fix_bkv, fixing the bkv column by converting nkv entries
+
+    :param bkvs: pandas series of bkv (or nkv) strings
+    :return: pandas series of bkv strings or None
+    """
+    codes, groups = _extract_unique(bkvs, VERSE_ID_PATTERN)
+    nkv_book_num = groups["nkv_book"].map(BOOK_NUMBERS_EN)
+    fixed = "B" + nkv_book_num + "K" + groups["nkv_chapter"] + "V" + groups["nkv_verse"]
+    fixed = fixed.where(
+        groups["nkv_book"].notna(), groups["value"].where(groups["bkv_book"].notna())
+    )
+    return _take_unique(codes, fixed, bkvs.index)
+
+
+def bkv_nkv_from_verse_ids(verse_ids: pd.Series) -> pd.DataFrame:
+    """Column-wise version of bkv_nkv_from_verse_id, converting verse ids to 'standardized' bkv and nkv formats
+
+    Every unique verse id is matched once against all formats and the book names are looked up in
+    constants.BOOK_NUMBERS_EN, so the cost depends on the number of different verses, not on the number of rows.
+
+    :param verse_ids: pandas series of verse ids (like "B01K1V1", "Matt.1.1", "Rom.inscriptio" or "B06KInscriptioV0")
+    :return: pandas dataframe of the bkv and nkv columns (None if not convertible) with the index of verse_ids
+    """
+    codes, groups = _extract_unique(verse_ids, VERSE_ID_PATTERN)
+    book_en = {key: value["en"] for key, value in BOOK_INFO.items()}
+    bkv = pd.Series(None, index=groups.index, dtype="object")
+    nkv = pd.Series(None, index=groups.index, dtype="object")
+
+    # nkv schema, nkv stays as it is
+    book_num = groups["nkv_book"].map(BOOK_NUMBERS_EN)
+    match = book_num.notna()
+    bkv[match] = (
+        "B" + book_num + "K" + groups["nkv_chapter"] + "V" + groups["nkv_verse"]
+    )
+    nkv[match] = groups["value"]
+
+    # bkv schema, bkv stays as it is
+    book_abb_en = groups["bkv_book"].map(book_en)
+    match = book_abb_en.notna()
+    bkv[match] = groups["value"]
+    nkv[match] = book_abb_en + "." + groups["bkv_chapter"] + "." + groups["bkv_verse"]
+
+    # inscriptio and subscriptio in nkv schema
+    book_num = groups["nkvs_book"].map(BOOK_NUMBERS_EN)
+    scriptio = groups["nkvs_scriptio"].str.capitalize()
+    match = book_num.notna()
+    bkv[match] = "B" + book_num + "K" + scriptio + "V0"
+    nkv[match] = groups["nkvs_book"] + "." + scriptio
+
+    # inscriptio and subscriptio in bkv schema
+    book_abb_en = groups["bkvs_book"].map(book_en)
+    scriptio = groups["bkvs_scriptio"].str.capitalize()
+    match = book_abb_en.notna()
+    bkv[match] = "B" + groups["bkvs_book"] + "K" + scriptio + "V0"
+    nkv[match] = book_abb_en + "." + scriptio
+
+    return pd.DataFrame(
+        {
+            "bkv": _take_unique(codes, bkv, verse_ids.index),
+            "nkv": _take_unique(codes, nkv, verse_ids.index),
+        }
+    )
+
+
 def generate_transcription_url(row: pd.Series) -> str or None:
     """Generate a transcription URL for a pandas dataframe row which has a nkv and docID assigned, as well as is
     sourced from the NTVMR.
@@ -400,13 +1088,25 @@ def generate_local_copies(
     return (local_verses, local_gendervoc)
 
 
-def search_words(words: pd.DataFrame, verses: pd.DataFrame):
+def search_words(
+    words: pd.DataFrame,
+    verses: pd.DataFrame,
+    engine: str = "regex",
+    matcher=None,
+):
     """search verses for given list of words
 
     :param words: pandas dataframe holding word variants (en_tag,el_tag,variant,gender,type,wordID,variantID)
     :param verses: pandas dataframe holding verses (bkv,text,docID)
+    :param engine: "regex" to search every variant on its own, "aho-corasick" to find all variants in one scan of a
+        verse, "token" to look up the tokens of a verse in a hash map of the variants
+    :param matcher: prebuilt matcher (see matchers.MATCHERS) of words to be reused by the chosen engine
 
     """
+    if engine not in MATCHERS:
+        raise ValueError(f"Unknown engine: {engine}")
+    if matcher is None:
+        matcher = MATCHERS[engine](words)
 
     # Add a new column "found" to store lists of variant IDs for each verse
     verses["found_variants"] = None
@@ -414,39 +1114,131 @@ def search_words(words: pd.DataFrame, verses: pd.DataFrame):
 
     # Set of all variants found in the given verses. Used to check against the variant_id_list to get
     word_id_set_bkv = set()
+    # Sets of the wordIDs found in each verse
+    word_id_sets_verse = []
 
     # for every verse (row  in verses dataframe)
-    for index, verse_row in verses.iterrows():
-        verse_text = verse_row["text"]
-
-        # Create an empty set to store matching variants for the current verse.
+    for index, verse_text in zip(verses.index, verses["text"]):
+        # Create an empty set to store matching variants (and their words) for the current verse.
         variant_id_set_verse = set()
+        word_id_set_verse = set()
 
-        # Iterate over each row in dataframe_names to search for variants in the current verse
-        for _, word_row in words.iterrows():
-            # get variant of this word_row
-            variant = word_row["variant"]
-            # Check if the variant is present in the verse text
-            if re.search(rf"\b{re.escape(variant)}\b", verse_text):
-                # write variants wordID to list
-                variant_id = word_row["variantID"]
-                variant_id_set_verse.add(variant_id)
-                word_id_set_bkv.add(word_row["wordID"])
+        # find all variants (and their wordIDs) of the current verse
+        for variant_id, word_id in matcher.find(verse_text):
+            variant_id_set_verse.add(variant_id)
+            word_id_set_verse.add(word_id)
 
+        word_id_set_bkv.update(word_id_set_verse)
+        word_id_sets_verse.append(word_id_set_verse)
         # add variant_id_list to verse_row column "found"
         verses.at[index, "found_variants"] = variant_id_set_verse
 
-    # for every verse (row  in verses dataframe)
-    # for index, verse_row in verses.iterrows():
-    #    variant_ids = verse_row["found_variants"]
-    #    word_ids = set(words[words["variantID"].isin(variant_ids)]["wordID"])
-    #    diff = word_id_set_bkv - word_ids
-    #    verses.at[index, "missing_wordIDs"] = diff
+    # words found in any verse, but not in this verse
+    verses["missing_wordIDs"] = [
+        word_id_set_bkv - word_id_set_verse for word_id_set_verse in word_id_sets_verse
+    ]
+
+
+def get_variant_word_lookup(gendervoc: pd.DataFrame) -> np.ndarray:
+    """Build a lookup array of the wordIDs of all variantIDs (which are dense integers, see 02_get_words)
+
+    :param gendervoc: pandas dataframe containing all gender bound vocabulary
+    :return: array holding the wordID of each variantID at index variantID, -1 for unknown variantIDs
+    """
+    variants = gendervoc.dropna(subset=["variantID", "wordID"]).drop_duplicates(
+        subset=["variantID"]
+    )
+    variant_ids = variants["variantID"].to_numpy(dtype=np.int64)
+    lookup = np.full(variant_ids.max() + 1 if len(variant_ids) else 0, -1, np.int64)
+    lookup[variant_ids] = variants["wordID"].to_numpy(dtype=np.int64)
+    return lookup
+
 
-    verses["missing_wordIDs"] = verses["found_variants"].apply(
-        lambda variant_ids: word_id_set_bkv
-        - set(words[words["variantID"].isin(variant_ids)]["wordID"])
-    )  # this is the compact form of the 5 lines above
+def get_occurrences(
+    verses: pd.DataFrame,
+    gendervoc: pd.DataFrame,
+    engine: str = "regex",
+    matcher=None,
+    variant_word_lookup: np.ndarray = None,
+) -> pd.DataFrame:
+    """Search verses for names and get the occurrences of all bkvs at once. A name (word) found in a verse is an
+    occurrence, a name found in another verse of the same bkv but not in this verse is a missing occurrence. Both are
+    computed by set arithmetic on a sparse verse x word incidence matrix.
+
+    :param verses: pandas dataframe holding verses (bkv,text,transcript,verse_id)
+    :param gendervoc: pandas dataframe containing all gender bound vocabulary
+    :param engine: search engine ("regex", "aho-corasick" or "token")
+    :param matcher: prebuilt matcher (see matchers.MATCHERS) of gendervoc to be reused by the chosen engine
+    :param variant_word_lookup: prebuilt lookup array (see get_variant_word_lookup) of gendervoc to be reused
+    :return: dataframe of occurrences (verse_id,variantID,occurrence,wordID), variantID is missing for missing
+        occurrences
+    """
+    verses = verses.dropna(subset=["transcript", "bkv"])
+    gendervoc = gendervoc.dropna(subset=["variant"])
+    if matcher is None:
+        matcher = MATCHERS[engine](gendervoc)
+    if variant_word_lookup is None:
+        variant_word_lookup = get_variant_word_lookup(gendervoc)
+
+    # search all verses: positions of the verses and the variantIDs found in them
+    found_verses = []
+    found_variant_ids = []
+    for verse_idx, verse_text in enumerate(verses["text"]):
+        for variant_id, _ in matcher.find(verse_text):
+            found_verses.append(verse_idx)
+            found_variant_ids.append(variant_id)
+    found_verses = np.array(found_verses, dtype=np.int64)
+    found_variant_ids = np.array(found_variant_ids, dtype=np.int64)
+    # resolve the wordIDs of the found variants by a vectorized gather
+    found_word_ids = variant_word_lookup[found_variant_ids]
+
+    # sparse verse x word incidence matrix of the found words
+    word_codes, word_ids = pd.factorize(found_word_ids)
+    verse_count = len(verses)
+    incidence = csr_matrix(
+        (np.ones(len(word_codes), dtype=np.int64), (found_verses, word_codes)),
+        shape=(verse_count, len(word_ids)),
+    )
+    incidence.data[:] = 1
+
+    # union of the found words per bkv, broadcast back to the verses of the bkv
+    bkv_codes, bkvs = pd.factorize(verses["bkv"])
+    membership = csr_matrix(
+        (np.ones(verse_count, dtype=np.int64), (bkv_codes, np.arange(verse_count))),
+        shape=(len(bkvs), verse_count),
+    )
+    bkv_words = membership @ incidence
+    bkv_words.data[:] = 1
+    # missing words: words of the bkv minus words of the verse
+    missing = bkv_words[bkv_codes] - incidence
+    missing.eliminate_zeros()
+    missing_verses, missing_word_codes = missing.nonzero()
+
+    verse_ids = verses["verse_id"].to_numpy()
+    occurrences = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "verse_id": verse_ids[found_verses],
+                    "variantID": pd.array(found_variant_ids, dtype="Int64"),
+                    "occurrence": True,
+                    "wordID": found_word_ids,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "verse_id": verse_ids[missing_verses],
+                    "variantID": pd.Series(
+                        pd.NA, index=range(len(missing_verses)), dtype="Int64"
+                    ),
+                    "occurrence": False,
+                    "wordID": word_ids[missing_word_codes],
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    return occurrences
 
 
 def process_bkv(
@@ -455,6 +1247,9 @@ def process_bkv(
     verses: pd.DataFrame,
     gendervoc: pd.DataFrame,
     overwrite: bool = True,
+    engine: str = "regex",
+    matcher=None,
+    variant_word_lookup: np.ndarray = None,
 ):
     """Search a BKV for names
 
@@ -463,6 +1258,9 @@ def process_bkv(
     :param verses: pandas dataframe containing all verses
     :param gendervoc: pandas dataframe containing all gender bound vocabulary
     :param overwrite: whether to overwrite existing data
+    :param engine: search engine passed to get_occurrences ("regex", "aho-corasick" or "token")
+    :param matcher: prebuilt matcher of gendervoc to be reused by the chosen engine
+    :param variant_word_lookup: prebuilt lookup array (see get_variant_word_lookup) of gendervoc to be reused
     :return:
     """
     output_file = f"{out_dir}/{bkv}.csv"
@@ -483,47 +1281,132 @@ def process_bkv(
             print(f"Dataframe for {bkv} is empty...")
             return
 
-        # update local_verses_df and get set of found variant ids
-        search_words(local_gendervoc_df, local_verses_df)
-
-        # Explode the "found" column, drop empty rows, rename columns 'missing' and 'found'
-        found = (
-            local_verses_df.explode("found_variants")
-            .rename(
-                columns={"missing_names": "occurrence", "found_variants": "variantID"}
-            )
-            .dropna(subset=["variantID"])
+        # search local_verses_df and get found and missing occurrences
+        occurrences = get_occurrences(
+            local_verses_df, local_gendervoc_df, engine, matcher, variant_word_lookup
         )
-        # set all entries to True
-        found.loc[:, "occurrence"] = True
-        found["wordID"] = found["variantID"].apply(
-            lambda variant_id: gendervoc.loc[
-                gendervoc["variantID"] == variant_id, "wordID"
-            ].values[0]
-        )
-
-        # Explode the "missing" column, drop empty rows, rename columns 'found' and 'missing'
-        missing = (
-            local_verses_df.explode("missing_wordIDs")
-            .rename(
-                columns={"found_variants": "occurrence", "missing_wordIDs": "wordID"}
-            )
-            .dropna(subset=["wordID"])
-        )
-        # set all entries to False
-        missing.loc[:, "occurrence"] = False
-
-        # merging dataframes of found and missing
-        occurrences = pd.concat([found, missing], ignore_index=True)
         # TODO: set occurrences cells with null to -1 for variantID integers, as when occurrence is FALSE,
         #  there will be no variantID given – only the wordID will be present
 
-        # get relevant columns only
-        occurrences = occurrences[["verse_id", "variantID", "occurrence", "wordID"]]
         # Writing the DataFrame to a CSV file
         occurrences.to_csv(output_file, index=False)
 
 
+# vocabulary, matcher and variantID -> wordID lookup of a search worker process, set once per process by
+# init_search_worker
+_worker_gendervoc = None
+_worker_matcher = None
+_worker_variant_word_lookup = None
+
+
+def init_search_worker(gendervoc: pd.DataFrame, engine: str = "token"):
+    """Initializer of a search worker process, which keeps the vocabulary (with its matcher and lookup array) for all
+    tasks of the process
+
+    :param gendervoc: pandas dataframe containing all gender bound vocabulary
+    :param engine: search engine passed to get_occurrences ("regex", "aho-corasick" or "token")
+    :return:
+    """
+    global _worker_gendervoc, _worker_matcher, _worker_variant_word_lookup
+    _worker_gendervoc = gendervoc
+    _worker_matcher = MATCHERS[engine](gendervoc)
+    _worker_variant_word_lookup = get_variant_word_lookup(gendervoc)
+
+
+def iter_bkv_batches(verses: pd.DataFrame, batch_size: int = 100):
+    """Group the verses by bkv once and yield the groups in batches
+
+    :param verses: pandas dataframe containing all verses
+    :param batch_size: number of bkvs per batch
+    :return: generator of lists of tuples of bkv and the dataframe containing only the verses of this bkv
+    """
+    batch = []
+    for bkv, bkv_verses in verses.groupby("bkv", sort=False, observed=True):
+        batch.append((bkv, bkv_verses))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# schema of the consolidated occurrences file, variantID is -1 for missing occurrences
+OCCURRENCES_SCHEMA = pa.schema(
+    [
+        ("verse_id", pa.int64()),
+        ("variantID", pa.int64()),
+        ("occurrence", pa.bool_()),
+        ("wordID", pa.int64()),
+    ]
+)
+
+
+def get_batch_occurrences(batch: list) -> (list, pd.DataFrame):
+    """Get the occurrences of a batch of BKVs at once with the vocabulary of the worker process (see init_search_worker)
+
+    :param batch: list of tuples of bkv and the dataframe containing only the verses of this bkv
+    :return: tuple of the list of processed bkvs and the dataframe of their occurrences (see OCCURRENCES_SCHEMA)
+    """
+    verses = pd.concat([bkv_verses for _, bkv_verses in batch])
+    occurrences = get_occurrences(
+        verses,
+        _worker_gendervoc,
+        matcher=_worker_matcher,
+        variant_word_lookup=_worker_variant_word_lookup,
+    )
+    # there is no variantID for missing occurrences
+    occurrences["variantID"] = occurrences["variantID"].fillna(-1)
+    occurrences = occurrences.astype(
+        {
+            "verse_id": "int64",
+            "variantID": "int64",
+            "occurrence": "bool",
+            "wordID": "int64",
+        }
+    )
+    return [bkv for bkv, _ in batch], occurrences
+
+
+def search_occurrences(
+    verses: pd.DataFrame,
+    gendervoc: pd.DataFrame,
+    output_file: str,
+    engine: str = "token",
+    batch_size: int = 100,
+    max_workers: int = None,
+):
+    """Search all BKVs for names in parallel and stream the occurrences into one parquet file, every finished batch of
+    BKVs is written as a row group of the file.
+
+    :param verses: pandas dataframe containing all verses
+    :param gendervoc: pandas dataframe containing all gender bound vocabulary
+    :param output_file: path to the parquet file to write the occurrences to
+    :param engine: search engine passed to get_occurrences ("regex", "aho-corasick" or "token")
+    :param batch_size: number of bkvs per task (and row group)
+    :param max_workers: number of worker processes (defaults to the number of processors)
+    :return: generator of lists of processed bkvs, one list per finished batch
+    """
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_search_worker,
+        initargs=(gendervoc, engine),
+    ) as executor, pq.ParquetWriter(output_file, OCCURRENCES_SCHEMA) as writer:
+        futures = [
+            executor.submit(get_batch_occurrences, batch)
+            for batch in iter_bkv_batches(verses, batch_size)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            bkvs, occurrences = future.result()
+            writer.write_table(
+                pa.Table.from_pandas(
+                    occurrences, schema=OCCURRENCES_SCHEMA, preserve_index=False
+                )
+            )
+            yield bkvs
+
+
 def get_docID_set(metadata_list_xml: str, all: bool = True) -> set:
     """Retrieve set of docIDs from an XML containing all catalogued manuscripts in the NTVMR.
 
@@ -557,8 +1440,13 @@ def get_docID_set(metadata_list_xml: str, all: bool = True) -> set:
     return doc_ids_set
 
 
+# first digits of a GA string (see ga_to_docID)
+GA_DIGITS_PATTERN = re.compile(r"[0-9]\d*")
+
+
 def ga_to_docID(row: pd.Series) -> int or None:
     """Convert the GA string corresponding docID for a given row of a pandas dataframe. ONLY do this when docID is Null.
+    For whole columns use converters.gas_to_docIDs.
 
     :param row: pandas dataframe row
     :return: docID integer or None if GA string is present, else just return already present rows docID
@@ -567,15 +1455,12 @@ def ga_to_docID(row: pd.Series) -> int or None:
         # Get ga from row data
         ga = str(row["ga"])
 
-        if not re.match(r"^[PL0-9]$", ga[0]):
+        if ga[0] not in "PL0123456789":
             raise AttributeError
 
-        # Compile the regular expression pattern
-        pattern = re.compile(r"([0-9]\d*)")
-
         # Remove non-digits from ga
         try:
-            ga_digits = re.search(pattern, ga).group()
+            ga_digits = GA_DIGITS_PATTERN.search(ga).group()
         except AttributeError:
             print(f"No digits found in GA string: {ga}")
             return None
@@ -602,17 +1487,297 @@ def ga_to_docID(row: pd.Series) -> int or None:
         return row["docID"]
 
 
-def gap_clean(text: str) -> str:
-    """Removes everything inside brackets except Greek characters, also removes the brackets.
+# column types of the manuscripts tables of TEI, JSON and DBpedia data
+MANUSCRIPTS_DTYPES = {
+    "docID": "string",
+    "pagesCount": "Int64",
+    "leavesCount": "Int64",
+    "ga": "string",
+    "century": "string",
+    "source": "string",
+    "label": "string",
+    "dbpedia": "string",
+}
+
 
-    :param text: Input string containing text with brackets
-    :return: Cleaned string with only Greek characters inside the brackets
+def read_manuscripts(file_path: str, columns: list = None) -> pd.DataFrame:
+    """Read a manuscripts CSV file (like ../data/manuscripts_json.csv) with the types of MANUSCRIPTS_DTYPES
+
+    :param file_path: path of the CSV file
+    :param columns: columns to read, all columns if None
+    :return: pandas dataframe of the manuscripts
+    """
+    return pd.read_csv(
+        file_path, usecols=columns, dtype=MANUSCRIPTS_DTYPES, low_memory=False
+    )
+
+
+def read_manuscript_json(file_path: str) -> dict:
+    """Read the metadata of a manuscript from its NTVMR JSON file
+
+    :param file_path: path of the JSON file
+    :return: dictionary of docID, pagesCount, leavesCount, century and source
+    """
+    with open(file_path, "r") as file:
+        manuscript = json.load(file)["data"]["manuscript"]
+    # sometimes century is not given
+    try:
+        century = manuscript["originYear"]["content"]
+    except (KeyError, TypeError):
+        century = None
+    return {
+        "docID": manuscript["docID"],
+        "pagesCount": manuscript["pages"]["count"],
+        "leavesCount": manuscript["leaves"]["leavesCount"],
+        "century": century,
+        "source": "ntvmr",
+    }
+
+
+def get_json_manuscripts(
+    json_files: list, max_workers: int = None, progress=None
+) -> pd.DataFrame:
+    """Read the metadata of the manuscripts of NTVMR JSON files in parallel into the manuscripts table of the JSON files
+
+    The GA strings are built of the docIDs (the gaNum of the JSON files is identical for uncials and minuscules).
+
+    :param json_files: paths of the JSON files
+    :param max_workers: number of reading processes (defaults to the number of processors)
+    :param progress: progress bar wrapping an iterable, like tqdm, or None
+    :return: pandas dataframe of the manuscripts (docID,pagesCount,leavesCount,ga,century,source)
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(read_manuscript_json, json_files, chunksize=64)
+        if progress is not None:
+            results = progress(results, total=len(json_files))
+        manuscripts_df = pd.DataFrame(
+            list(results),
+            columns=["docID", "pagesCount", "leavesCount", "century", "source"],
+        )
+    gas, invalid_ga = docIDs_to_gas(manuscripts_df["docID"])
+    manuscripts_df.insert(3, "ga", gas)
+    print(f"{invalid_ga.sum()} manuscripts with invalid docID")
+    return manuscripts_df
+
+
+def query_dbpedia_manuscripts(
+    endpoint: str = DBPEDIA_SPARQL_ENDPOINT, query: str = DBPEDIA_SPARQL_QUERY
+) -> pd.DataFrame:
+    """Query DBpedia for the Greek New Testament manuscripts
+
+    :param endpoint: SPARQL endpoint
+    :param query: SPARQL query
+    :return: pandas dataframe of the results (entry,entryLabel,form,number,found)
+    :raises requests.HTTPError: if the query failed
+    """
+    response = requests.get(
+        endpoint, params={"query": query, "format": "json"}, timeout=300
+    )
+    response.raise_for_status()
+    return pd.DataFrame(
+        [
+            {key: binding[key]["value"] for key in binding}
+            for binding in response.json()["results"]["bindings"]
+        ],
+        columns=["entry", "entryLabel", "form", "number", "found"],
+    )
+
+
+def _clean_number(value: str) -> int or None:
+    """Convert the number of a manuscript of DBpedia to an integer
+
+    :param value: number string
+    :return: integer or None if the number is a decimal or has no digits
     """
     try:
-        return re.sub(
-            r"\[([^\]]*)\]",
-            lambda match: "".join(re.findall(r"[Α-Ωα-ω]+", match.group(1))),
-            text,
+        if float(value) % 1 != 0:
+            return None
+    except (TypeError, ValueError):
+        return None
+    digits = "".join(filter(str.isdigit, value))
+    return int(digits) if digits else None
+
+
+def clean_dbpedia_manuscripts(sparql_df: pd.DataFrame) -> pd.DataFrame:
+    """Clean the manuscripts of DBpedia: build their GA of form and number and merge their rows
+
+    :param sparql_df: pandas dataframe of the results of query_dbpedia_manuscripts
+    :return: pandas dataframe of the manuscripts (dbpedia,label,ga,source)
+    """
+    sparql_df = sparql_df.copy()
+    sparql_df["number"] = sparql_df["number"].map(_clean_number)
+    # if a number is greater than 3000 (by mistake) set it to None
+    sparql_df.loc[sparql_df["number"] > 3000, "number"] = None
+    # merge the found entries of otherwise duplicate rows
+    sparql_df["found"] = sparql_df["found"].fillna("").astype(str)
+    sparql_df = sparql_df.groupby(
+        ["entry", "entryLabel", "form", "number"], as_index=False
+    )["found"].agg(",".join)
+    # build the GA of form and number column-wise, e.g. "046" for the uncial 46
+    sparql_df["ga"], invalid_ga = forms_to_gas(sparql_df["form"], sparql_df["number"])
+    print(f"{invalid_ga.sum()} entries with invalid form or number")
+    sparql_df = sparql_df.rename(columns={"entry": "dbpedia", "entryLabel": "label"})
+    sparql_df = sparql_df.drop(columns=["number", "form", "found"])
+    sparql_df["source"] = "dbpedia"
+    sparql_df["dbpedia"] = sparql_df["dbpedia"].str.replace(
+        "http://dbpedia.org/resource/", "", regex=False
+    )
+    return sparql_df
+
+
+def _merge_rows(group: pd.DataFrame) -> pd.Series:
+    """Merge the rows of a manuscript into one, keeping a non-missing value of every column
+
+    :param group: pandas dataframe of the rows of a GA and source
+    :return: merged row
+    """
+    merged_row = {"ga": group["ga"].iloc[0], "source": group["source"].iloc[0]}
+    for col in group.columns:
+        if col not in ["ga", "source"]:
+            merged_row[col] = next(
+                (value for value in set(group[col]) if pd.notna(value)), np.nan
+            )
+    return pd.Series(merged_row)
+
+
+def merge_manuscripts(manuscripts_df: pd.DataFrame, dbpedia_df: pd.DataFrame):
+    """Merge the manuscripts of TEI and JSON files with the ones of DBpedia into the manuscripts table, one row per GA
+    and source
+
+    :param manuscripts_df: pandas dataframe of the manuscripts of TEI and JSON files
+    :param dbpedia_df: pandas dataframe of the manuscripts of DBpedia (see clean_dbpedia_manuscripts)
+    :return: pandas dataframe of the manuscripts table, missing strings are "NA" and missing counts -1
+    """
+    merged_df = pd.concat([manuscripts_df, dbpedia_df], ignore_index=True)
+    merged_df = (
+        merged_df.groupby(["ga", "source"]).apply(_merge_rows).reset_index(drop=True)
+    )
+    for col in ["docID", "ga", "century", "source", "label", "dbpedia"]:
+        merged_df[col] = merged_df[col].fillna("NA").astype(str)
+    for col in ["pagesCount", "leavesCount"]:
+        merged_df[col] = merged_df[col].fillna(-1).astype(int)
+    return merged_df
+
+
+# columns of the word lists merged into the variants of a word
+NAME_COLUMNS = ["label:el", "Nom Sg", "Gen Sg", "Dat Sg", "Akk Sg", "Voc Sg"]
+NOMINAL_COLUMNS = NAME_COLUMNS + ["Nom Pl", "Gen Pl", "Dat Pl", "Akk Pl", "Voc Pl"]
+
+
+def _columns_to_set(row: pd.Series) -> set:
+    """Merge the comma separated values of all columns of a row into a set
+
+    :param row: pandas dataframe row
+    :return: set of the values
+    """
+    return {e for elem in row if pd.notnull(elem) for e in elem.split(",")}
+
+
+def _read_word_list(
+    file_path: str, columns: list, word_type: str, extra_columns: list
+) -> pd.DataFrame:
+    """Read a curated word list and merge the normalized forms of every word into its variants
+
+    :param file_path: path of the CSV file
+    :param columns: columns holding the forms of a word
+    :param word_type: type of the words ("name" or "nominal")
+    :param extra_columns: further columns to read
+    :return: pandas dataframe of the words with their set of variants
+    """
+    words_df = pd.read_csv(
+        file_path, usecols=["label:en", "gender"] + extra_columns + columns
+    )
+    # remove rows with empty greek label
+    words_df = words_df.dropna(subset=["label:el"], ignore_index=True)
+    # as the transcripts contain no accents and are lowercase, the forms are normalized alike
+    for col in columns:
+        words_df[col] = normalize_series(words_df[col])
+    if "label:el:norm" not in words_df.columns:
+        words_df["label:el:norm"] = words_df["label:el"]
+    words_df["variants"] = words_df[columns].apply(_columns_to_set, axis=1)
+    words_df = words_df.drop(columns=columns)
+    words_df["type"] = word_type
+    return words_df
+
+
+def get_words_table(names_file: str, nominals_file: str = None) -> pd.DataFrame:
+    """Build the words table of the curated lists of names and nominals: one row per variant (normalized form) of a
+    word, numbered by wordID and variantID
+
+    :param names_file: path of the curated list of names (like ../data/tables/names.csv)
+    :param nominals_file: path of the curated list of nominals, only names are read if None or the file does not exist
+    :return: pandas dataframe of the words table
+    """
+    word_lists = [
+        _read_word_list(
+            names_file,
+            NAME_COLUMNS + ["alternatives"],
+            "name",
+            ["label:el:norm", "factgrid"],
         )
-    except TypeError as e:
-        print(e, text)
+    ]
+    if nominals_file is not None and os.path.exists(nominals_file):
+        word_lists.append(
+            _read_word_list(nominals_file, NOMINAL_COLUMNS, "nominal", [])
+        )
+    else:
+        print(f"No list of nominals ({nominals_file}), only names are read")
+    merged_df = pd.concat(word_lists)
+
+    # number the words, then explode them by variant and number the variants
+    merged_df["wordID"] = range(0, len(merged_df))
+    merged_df = merged_df.rename(columns={"variants": "variant"})
+    merged_df = merged_df.explode("variant").reset_index(drop=True)
+    merged_df["variantID"] = range(0, len(merged_df))
+
+    # keep the FactGrid entity numbers only
+    merged_df["factgrid"] = merged_df["factgrid"].astype(str).str.split(",").map(set)
+    merged_df = merged_df.explode("factgrid")
+    merged_df["factgrid"] = merged_df["factgrid"].str.replace(
+        "https://database.factgrid.de/entity/", ""
+    )
+
+    merged_df["factgrid"] = merged_df["factgrid"].replace("nan", "NA")
+    # TODO: "?" as gender should be revised in the original table
+    merged_df["gender"] = merged_df["gender"].fillna("NA").replace("?", "NA")
+    merged_df["label:en"] = merged_df["label:en"].fillna("NA")
+    return merged_df
+
+
+def get_name_tables(
+    words_df: pd.DataFrame, occurrences_df: pd.DataFrame
+) -> (pd.DataFrame, pd.DataFrame):
+    """Get the words and occurrences of names only, for publishing
+
+    :param words_df: pandas dataframe of the words table
+    :param occurrences_df: pandas dataframe of the occurrences
+    :return: tuple of pandas dataframes of the names (without type, missing values as "NA") and of their occurrences
+    """
+    names_words_df = words_df[words_df["type"] == "name"].drop(columns=["type"])
+    names_occurrences_df = occurrences_df[
+        occurrences_df["wordID"].isin(names_words_df["wordID"].unique())
+    ]
+    return names_words_df.fillna("NA"), names_occurrences_df
+
+
+def get_theo_occurrences(
+    occurrences_df: pd.DataFrame, words_df: pd.DataFrame, verses_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Join the occurrences with their word (all variants squashed into sets) and verse, for publishing
+
+    :param occurrences_df: pandas dataframe of the occurrences
+    :param words_df: pandas dataframe of the words table
+    :param verses_df: pandas dataframe of the verses table
+    :return: pandas dataframe of the joined occurrences
+    """
+    words_squashed = words_df.groupby("wordID").agg(set).reset_index()
+    theo_occurrences = pd.merge(
+        occurrences_df, words_squashed, how="left", on="wordID"
+    ).merge(verses_df, how="left", on="verse_id")
+    return theo_occurrences.rename(
+        columns={
+            "variantID_x": "variantID",
+            "variant": "variants",
+            "variantID_y": "variantIDs",
+        }
+    )
@@ -0,0 +1,166 @@
+import pandas as pd
+import re
+from constants import BOOK_INFO, BOOK_NUMBERS_EN
+
+# Layout of a packed verse key (int32), from the highest to the lowest bits:
+#   book (6 bits) | section (2 bits) | chapter (12 bits) | verse (10 bits)
+# The section is 0 for the inscriptio, 1 for the text and 2 for the subscriptio of a book, so sorting the keys sorts
+# the verses in canonical order (inscriptio, chapters and verses numerically, subscriptio).
+BOOK_SHIFT = 24
+SECTION_SHIFT = 22
+CHAPTER_SHIFT = 10
+MAX_CHAPTER = (1 << (SECTION_SHIFT - CHAPTER_SHIFT)) - 1
+MAX_VERSE = (1 << CHAPTER_SHIFT) - 1
+
+# sections of a book, the scriptio names as written in bkv and nkv
+SECTIONS = {"Inscriptio": 0, None: 1, "Subscriptio": 2}
+SCRIPTIOS = {section: scriptio for scriptio, section in SECTIONS.items()}
+
+BKV_PATTERN = re.compile(
+    r"B(\d{2})K(?:(\d+)|([Ii]nscriptio|[Ss]ubscriptio))V(\d+)", re.ASCII
+)
+NKV_PATTERN = re.compile(
+    r"([1-3A-Za-z]+)\.(?:(\d+)\.(\d+)|([Ii]nscriptio|[Ss]ubscriptio))", re.ASCII
+)
+
+
+def pack(book: int, chapter: int, verse: int, scriptio: str = None) -> int or None:
+    """Pack a verse reference into an integer key
+
+    :param book: book number (see constants.BOOK_INFO)
+    :param chapter: chapter number, ignored for inscriptio and subscriptio
+    :param verse: verse number, ignored for inscriptio and subscriptio (verse 0, like utils.bkv_nkv_from_verse_ids
+        writes them)
+    :param scriptio: "Inscriptio" or "Subscriptio" (any case), None for the text of a book
+    :return: integer key or None if the reference cannot be packed
+    """
+    if scriptio is not None:
+        scriptio = scriptio.capitalize()
+        chapter = 0
+        verse = 0
+    if (
+        f"{book:02d}" not in BOOK_INFO
+        or scriptio not in SECTIONS
+        or not 0 <= chapter <= MAX_CHAPTER
+        or not 0 <= verse <= MAX_VERSE
+    ):
+        return None
+    return (
+        (book << BOOK_SHIFT)
+        | (SECTIONS[scriptio] << SECTION_SHIFT)
+        | (chapter << CHAPTER_SHIFT)
+        | verse
+    )
+
+
+def unpack(key: int) -> tuple:
+    """Unpack an integer key into its verse reference
+
+    :param key: integer key
+    :return: tuple of book number, chapter, verse and scriptio ("Inscriptio", "Subscriptio" or None)
+    """
+    return (
+        key >> BOOK_SHIFT,
+        (key >> CHAPTER_SHIFT) & MAX_CHAPTER,
+        key & MAX_VERSE,
+        SCRIPTIOS[(key >> SECTION_SHIFT) & 3],
+    )
+
+
+def bkv_to_key(bkv: str) -> int or None:
+    """Convert a bkv (like "B01K12V22" or "B06KInscriptioV0") to its integer key
+
+    :param bkv: bkv string
+    :return: integer key or None
+    """
+    match = BKV_PATTERN.fullmatch(bkv) if isinstance(bkv, str) else None
+    if not match:
+        return None
+    book, chapter, scriptio, verse = match.groups()
+    return pack(int(book), int(chapter or 0), int(verse), scriptio)
+
+
+def nkv_to_key(nkv: str) -> int or None:
+    """Convert a nkv (like "Matt.12.22" or "Rom.Inscriptio") to its integer key
+
+    :param nkv: nkv string
+    :return: integer key or None
+    """
+    match = NKV_PATTERN.fullmatch(nkv) if isinstance(nkv, str) else None
+    if not match or match.group(1) not in BOOK_NUMBERS_EN:
+        return None
+    book_name, chapter, verse, scriptio = match.groups()
+    book = int(BOOK_NUMBERS_EN[book_name])
+    return pack(book, int(chapter or 0), int(verse or 0), scriptio)
+
+
+def key_to_bkv(key: int) -> str:
+    """Convert an integer key to its bkv, in the form of utils.bkv_nkv_from_verse_ids (like "B06KInscriptioV0")
+
+    :param key: integer key
+    :return: bkv string
+    """
+    book, chapter, verse, scriptio = unpack(key)
+    return f"B{book:02d}K{scriptio or chapter}V{verse}"
+
+
+def key_to_nkv(key: int) -> str:
+    """Convert an integer key to its nkv
+
+    :param key: integer key
+    :return: nkv string
+    """
+    book, chapter, verse, scriptio = unpack(key)
+    book_abb_en = BOOK_INFO[f"{book:02d}"]["en"]
+    return (
+        f"{book_abb_en}.{scriptio}" if scriptio else f"{book_abb_en}.{chapter}.{verse}"
+    )
+
+
+def _map_unique(values: pd.Series, func, dtype: str) -> pd.Series:
+    """Apply a function to the unique values of a column only, as verse references repeat in every manuscript
+
+    :param values: pandas series
+    :param func: function converting a single value
+    :param dtype: dtype of the result
+    :return: pandas series of the converted values (missing values stay missing)
+    """
+    codes, uniques = pd.factorize(values)
+    converted = pd.array([func(value) for value in uniques] + [None], dtype=dtype)
+    return pd.Series(converted[codes], index=values.index)
+
+
+def encode_bkvs(bkvs: pd.Series) -> pd.Series:
+    """Convert a column of bkvs to integer keys
+
+    :param bkvs: pandas series of bkv strings
+    :return: pandas series of integer keys (Int32, missing if not convertible)
+    """
+    return _map_unique(bkvs, bkv_to_key, "Int32")
+
+
+def encode_nkvs(nkvs: pd.Series) -> pd.Series:
+    """Convert a column of nkvs to integer keys
+
+    :param nkvs: pandas series of nkv strings
+    :return: pandas series of integer keys (Int32, missing if not convertible)
+    """
+    return _map_unique(nkvs, nkv_to_key, "Int32")
+
+
+def decode_bkvs(keys: pd.Series) -> pd.Series:
+    """Convert a column of integer keys to bkvs
+
+    :param keys: pandas series of integer keys
+    :return: pandas series of bkv strings
+    """
+    return _map_unique(keys, key_to_bkv, "string")
+
+
+def decode_nkvs(keys: pd.Series) -> pd.Series:
+    """Convert a column of integer keys to nkvs
+
+    :param keys: pandas series of integer keys
+    :return: pandas series of nkv strings
+    """
+    return _map_unique(keys, key_to_nkv, "string")